@@ -0,0 +1,242 @@
+"""Офлайн-распознавание показаний по архиву фотографий.
+
+Прогоняет полный конвейер (панели -> цифры -> показания) по каталогу
+или файлу-манифесту. Изображения декодируются заранее в пуле потоков,
+обе модели работают на больших батчах. Результаты дописываются в JSONL
+или Parquet (нужен пакет pyarrow) с периодическими контрольными точками,
+повторный запуск продолжает с места остановки.
+
+Запуск из каталога app:
+    python batch_infer.py ../data/images --output readings.jsonl
+    python batch_infer.py archive.txt --output readings.parquet --batch-size 64
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import decode_config
+from src.decode import DecodedImage, decode_image
+from src.offline import collect_images, load_done
+from src.predict import DetectedObject
+from src.registry import registry
+from src.router import format_readings, get_predictions_batch
+
+# Путь, декодированное изображение или текст ошибки декодирования
+Frame = Tuple[Path, Optional[DecodedImage], Optional[str]]
+
+
+def load_image(path: Path) -> DecodedImage:
+    """Читает и декодирует изображение в уменьшенном размере."""
+
+    with path.open("rb") as f:
+        return decode_image(f, decode_config.target_size)
+
+
+def prefetch(paths: Iterable[Path], workers: int, depth: int) -> Iterator[Frame]:
+    """Декодирует изображения в пуле потоков на `depth` штук вперед.
+
+    Порядок сохраняется; ошибка декодирования возвращается вместо изображения.
+    """
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: "deque[Tuple[Path, Future]]" = deque()
+        for path in paths:
+            pending.append((path, executor.submit(load_image, path)))
+            if len(pending) >= depth:
+                yield resolve(*pending.popleft())
+        while pending:
+            yield resolve(*pending.popleft())
+
+
+def resolve(path: Path, future: Future) -> Frame:
+    try:
+        return path, future.result(), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def make_row(
+    path: Path,
+    decoded: Optional[DecodedImage] = None,
+    panel: Optional[DetectedObject] = None,
+    digits: Optional[DetectedObject] = None,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Формирует строку результата; координаты -- в пикселях исходного фото.
+
+    Поля те же, что в ответе `/image/readings`: `value` и `digits` самой
+    уверенной панели и `meters` -- показания всех счетчиков на фото.
+    """
+
+    row: Dict[str, Any] = {
+        "path": str(path),
+        "value": None,
+        "digits": [],
+        "meters": [],
+        "error": error,
+    }
+    if decoded is None or panel is None or digits is None:
+        return row
+
+    row.update(format_readings(panel, digits, decoded.scale))
+    return row
+
+
+class JsonlWriter:
+    """Дописывает результаты в JSONL; контрольная точка сбрасывает файл на диск."""
+
+    def __init__(self, output: Path) -> None:
+        self.file = output.open("a", encoding="utf-8")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def checkpoint(self) -> None:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        self.checkpoint()
+        self.file.close()
+
+
+class ParquetWriter:
+    """Пишет результаты в каталог Parquet: по файлу на каждую контрольную точку."""
+
+    def __init__(self, output: Path) -> None:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise SystemExit("Parquet output requires pyarrow") from e
+        output.mkdir(parents=True, exist_ok=True)
+        self.output = output
+        self.rows: List[Dict[str, Any]] = []
+        self.part = len(list(output.glob("part-*.parquet")))
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self.rows.extend(rows)
+
+    def checkpoint(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.rows:
+            return
+        path = self.output / f"part-{self.part:05d}.parquet"
+        # Запись через временный файл, чтобы не оставлять обрезанных частей
+        tmp_path = path.with_suffix(".tmp")
+        pq.write_table(pa.Table.from_pylist(self.rows), tmp_path)
+        tmp_path.replace(path)
+        self.part += 1
+        self.rows = []
+
+    def close(self) -> None:
+        self.checkpoint()
+
+
+def batched(items: Iterable[Frame], size: int) -> Iterator[List[Frame]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process_batch(
+    batch: List[Frame],
+) -> List[Dict[str, Any]]:
+    """Прогоняет батч через обе модели; ошибки декодирования не прерывают батч."""
+
+    rows = [make_row(path, error=error) for path, _, error in batch]
+    decoded = [(i, img) for i, (_, img, _) in enumerate(batch) if img is not None]
+    if decoded:
+        predictions = get_predictions_batch([img.array for _, img in decoded])
+        for (i, img), (panels, digits) in zip(decoded, predictions):
+            rows[i] = make_row(batch[i][0], img, panels[0], digits[0])
+    return rows
+
+
+def run(args: argparse.Namespace) -> None:
+    images = collect_images(args.source)
+    done = set()
+    if args.resume:
+        done = load_done(
+            args.output, lambda row: row["error"] is None, columns=["path", "error"]
+        )
+    pending = [path for path in images if str(path) not in done]
+    print(f"Изображений: {len(images)}, уже обработано: {len(done)}")
+
+    registry.load()
+    writer = (
+        ParquetWriter(args.output)
+        if args.output.suffix == ".parquet"
+        else JsonlWriter(args.output)
+    )
+
+    processed = failed = 0
+    start = last_checkpoint = time.perf_counter()
+    frames = prefetch(pending, args.workers, args.batch_size * args.prefetch)
+    try:
+        for batch in batched(frames, args.batch_size):
+            rows = process_batch(batch)
+            writer.write(rows)
+            processed += len(rows)
+            failed += sum(row["error"] is not None for row in rows)
+
+            now = time.perf_counter()
+            if now - last_checkpoint >= args.checkpoint_s:
+                writer.checkpoint()
+                last_checkpoint = now
+                print(
+                    f"{processed}/{len(pending)} "
+                    f"({processed / (now - start):.1f} изображений/с)"
+                )
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Обработано: {processed} за {elapsed:.1f} с "
+        f"({processed / elapsed if elapsed else 0:.2f} изображений/с), "
+        f"ошибок: {failed}"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Офлайн-распознавание показаний по архиву фотографий."
+    )
+    parser.add_argument("source", type=Path, help="каталог с фото или файл-манифест")
+    parser.add_argument("--output", type=Path, default=Path("readings.jsonl"))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4, help="потоков декодирования")
+    parser.add_argument(
+        "--prefetch", type=int, default=2, help="сколько батчей декодировать вперед"
+    )
+    parser.add_argument(
+        "--checkpoint-s",
+        type=float,
+        default=30.0,
+        help="как часто сохранять результаты на диск, с",
+    )
+    parser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="не пропускать изображения, уже записанные в --output",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,101 @@
+"""Сравнивает бэкенды инференса на CPU: задержку, пропускную способность и точность.
+
+Перед запуском экспортируйте модели: python export.py --int8 (из корня репозитория)
+и скопируйте их в каталог models приложения.
+
+Запуск из каталога app: python -m benchmarks.backends --images ../data/images
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from benchmarks.common import (
+    IMAGES_DIR,
+    load_images,
+    parse_ground_truth,
+    reading_matches,
+    summarize,
+)
+from src.backends import Backend, exported_model_path
+from src.predict import extract_value
+from src.registry import registry
+from src.router import get_predictions, get_predictions_batch
+
+CPU_VARIANTS = [
+    ("torch-cpu", False),
+    ("onnx", False),
+    ("onnx", True),
+    ("openvino", False),
+    ("openvino", True),
+]
+
+
+def is_exported(backend: str, int8: bool) -> bool:
+    """Проверяет, что веса обеих моделей для бэкенда существуют."""
+
+    return all(
+        exported_model_path(path, Backend(backend), int8).exists()
+        for path in (registry.config.panels_path, registry.config.digits_path)
+    )
+
+
+def run_variant(images, backend: str, int8: bool, batch_size: int) -> dict:
+    """Загружает модели бэкенда и измеряет его на изображениях."""
+
+    registry.config.backend = backend
+    registry.config.int8 = int8
+    registry.load()
+
+    latencies, correct = [], 0
+    for path, img in images:
+        start = time.perf_counter()
+        _, digits = get_predictions(img)
+        latencies.append(time.perf_counter() - start)
+        correct += reading_matches(extract_value(digits[0]), parse_ground_truth(path))
+
+    arrays = [img for _, img in images]
+    start = time.perf_counter()
+    for i in range(0, len(arrays), batch_size):
+        get_predictions_batch(arrays[i : i + batch_size])
+    throughput = len(arrays) / (time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "int8": int8,
+        "latency": summarize(latencies),
+        "throughput_img_s": throughput,
+        "accuracy": correct / len(images),
+        "load_times": dict(registry.load_times),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=Path, default=IMAGES_DIR)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", type=Path, help="JSON-файл для результатов")
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    report = []
+    for backend, int8 in CPU_VARIANTS:
+        if not is_exported(backend, int8):
+            print(f"skip {backend}{' int8' if int8 else ''}: models are not exported")
+            continue
+        report.append(run_variant(images, backend, int8, args.batch_size))
+
+    print(f"{'backend':<16}{'p50, ms':>10}{'p95, ms':>10}{'img/s':>10}{'accuracy':>10}")
+    for row in report:
+        name = row["backend"] + (" int8" if row["int8"] else "")
+        print(
+            f"{name:<16}{row['latency']['p50_ms']:>10.1f}{row['latency']['p95_ms']:>10.1f}"
+            f"{row['throughput_img_s']:>10.2f}{row['accuracy']:>10.1%}"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
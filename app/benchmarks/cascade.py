@@ -0,0 +1,61 @@
+"""Сравнивает полнокадровый режим и каскад (цифры на вырезке панели).
+
+Для каждого режима считаются задержка на изображение и точность
+распознавания показаний целиком по истинным значениям из имен файлов.
+
+Запуск из каталога app: python -m benchmarks.cascade --images ../data/images
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from benchmarks.common import (
+    IMAGES_DIR,
+    load_images,
+    parse_ground_truth,
+    print_summary,
+    reading_matches,
+    summarize,
+)
+from src.config import pipeline_config
+from src.predict import extract_value
+from src.registry import registry
+from src.router import get_predictions
+
+
+def run_mode(images, cascade: bool, repeats: int) -> tuple[list[float], float]:
+    """Возвращает задержки и долю точно распознанных показаний."""
+
+    pipeline_config.cascade = cascade
+    latencies, correct = [], 0
+    for repeat in range(repeats):
+        for path, img in images:
+            start = time.perf_counter()
+            _, digits = get_predictions(img)
+            latencies.append(time.perf_counter() - start)
+            if repeat == 0:
+                value = extract_value(digits[0])
+                correct += reading_matches(value, parse_ground_truth(path))
+    return latencies, correct / len(images)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=Path, default=IMAGES_DIR)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--padding", type=float, default=pipeline_config.panel_padding)
+    args = parser.parse_args()
+
+    pipeline_config.panel_padding = args.padding
+    images = load_images(args.images)
+    registry.load()
+
+    for name, cascade in (("full frame", False), ("cascade", True)):
+        latencies, accuracy = run_mode(images, cascade, args.repeats)
+        print_summary(name, summarize(latencies))
+        print(f"{'':<24} exact reading accuracy: {accuracy:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import re
+import statistics
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+IMAGES_DIR = Path("../data/images")
+
+# Истинное значение зашито в имя файла: id_12_value_414_676.jpg -> 414.676
+GROUND_TRUTH_PATTERN = re.compile(r"value_(\d+)_(\d+)")
+# Барабанов дробной части у счетчиков датасета; в имени файла ее хвостовые
+# нули потеряны: id_1029_value_409_55.jpg -> 409.550
+FRACTION_DIGITS = 3
+
+
+def load_images(images_dir: Path = IMAGES_DIR) -> List[Tuple[Path, np.ndarray]]:
+    """Загружает изображения счетчиков из каталога."""
+
+    paths = sorted(p for p in images_dir.iterdir() if p.suffix.lower() == ".jpg")
+    return [(path, np.array(Image.open(path))) for path in paths]
+
+
+def parse_ground_truth(path: Path) -> str:
+    """Возвращает истинные показания из имени файла в виде строки цифр.
+
+    Дробная часть дополняется нулями до `FRACTION_DIGITS` барабанов.
+    """
+
+    match = GROUND_TRUTH_PATTERN.search(path.stem)
+    if match is None:
+        raise ValueError(f"No ground truth in file name: {path.name}")
+    return match.group(1) + match.group(2).ljust(FRACTION_DIGITS, "0")
+
+
+def normalize_reading(value: str) -> str:
+    """Приводит показания к сравнимому виду: ведущие нули барабанов не учитываются.
+
+    Хвостовые нули значимы; потерянные в имени файла восстанавливает
+    `parse_ground_truth`.
+    """
+
+    return value.lstrip("0")
+
+
+def reading_matches(predicted: str, ground_truth: str) -> bool:
+    """Проверяет совпадение распознанных показаний с истинными."""
+
+    return normalize_reading(predicted) == normalize_reading(ground_truth)
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Считает статистики задержек в миллисекундах."""
+
+    ms = sorted(t * 1000 for t in latencies)
+    return {
+        "n": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def print_summary(name: str, stats: Dict[str, float]) -> None:
+    """Печатает строку отчета."""
+
+    print(
+        f"{name:<24} n={stats['n']:<5} mean={stats['mean_ms']:8.1f} ms  "
+        f"p50={stats['p50_ms']:8.1f} ms  p95={stats['p95_ms']:8.1f} ms  "
+        f"p99={stats['p99_ms']:8.1f} ms"
+    )
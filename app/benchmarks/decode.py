@@ -0,0 +1,91 @@
+"""Измеряет время декодирования и пиковую память на больших фотографиях.
+
+Сравнивает прежнее np.array(Image.open(...)) с декодированием в полном
+размере и с уменьшенным декодированием JPEG до разных целевых размеров.
+Фото 12 Мп получаются увеличением изображений из data/images.
+
+Запуск из каталога app: python -m benchmarks.decode --images ../data/images
+"""
+
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import IMAGES_DIR
+from src.decode import decode_image
+
+MODES = {
+    "legacy np.array": None,
+    "full decode": 0,
+    "draft 1280": 1280,
+    "draft 640": 640,
+}
+
+
+def make_large_photos(
+    images_dir: Path, output_dir: Path, megapixels: float
+) -> List[Path]:
+    """Сохраняет увеличенные копии изображений как JPEG заданного размера."""
+
+    paths = []
+    for path in sorted(images_dir.glob("*.jpg")):
+        img = Image.open(path).convert("RGB")
+        factor = (megapixels * 1e6 / (img.width * img.height)) ** 0.5
+        size = (int(img.width * factor), int(img.height * factor))
+        output = output_dir / path.name
+        img.resize(size, Image.BICUBIC).save(output, quality=92)
+        paths.append(output)
+    return paths
+
+
+def run_mode(paths: List[Path], target_size: Optional[int], repeats: int) -> dict:
+    """Декодирует файлы в текущем процессе и возвращает время и прирост памяти."""
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in range(repeats):
+        for path in paths:
+            with path.open("rb") as f:
+                start = time.perf_counter()
+                if target_size is None:
+                    array = np.array(Image.open(f))
+                else:
+                    array = decode_image(f, target_size).array
+                times.append(time.perf_counter() - start)
+            del array
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mean_ms": float(np.mean(times) * 1000),
+        "peak_mb": (peak_kb - baseline_kb) / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=Path, default=IMAGES_DIR)
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_large_photos(args.images, Path(tmp), args.megapixels)
+        for name, target_size in MODES.items():
+            # Каждый режим в отдельном процессе, чтобы пиковая память не смешивалась
+            with ctx.Pool(1) as pool:
+                stats = pool.apply(run_mode, (paths, target_size, args.repeats))
+            print(
+                f"{name:<18} decode={stats['mean_ms']:8.1f} ms  "
+                f"peak memory +{stats['peak_mb']:7.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Сравнивает память, которую занимают результаты детекции на один запрос.
+
+Прежнее представление: списки списков Python, копия словаря имен
+в каждом объекте и результаты ultralytics (исходное изображение и маски),
+которые живут до конца обработки батча. Новое: массивы NumPy, общая
+таблица имен и явное освобождение результатов сразу после извлечения.
+
+Результаты ultralytics собираются синтетически, модели не нужны.
+
+Запуск из каталога app: python -m benchmarks.memory
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from src.predict import extract_detected_object_from_results
+
+
+def legacy_extract(results: List[Results]) -> List[Dict]:
+    """Прежнее извлечение: `.tolist()` каждого поля и копия словаря имен."""
+
+    objects = []
+    for result in results:
+        objects.append(
+            {
+                "image": Path(result.path).name,
+                "names": dict(result.names),
+                "cls": result.boxes.cls.cpu().numpy().astype(int).tolist(),
+                "conf": result.boxes.conf.cpu().tolist(),
+                "xyxy": result.boxes.xyxy.cpu().numpy().astype(int).tolist(),
+            }
+        )
+    return objects
+
+
+def make_results(
+    batch: int, detections: int, size: int, with_masks: bool
+) -> List[Results]:
+    """Создает результаты ultralytics для батча изображений."""
+
+    rng = np.random.default_rng(0)
+    names = {i: str(i) for i in range(10)}
+    results = []
+    for i in range(batch):
+        xy = rng.uniform(0, size * 0.9, (detections, 2))
+        wh = rng.uniform(10, size * 0.1, (detections, 2))
+        boxes = np.column_stack(
+            [
+                xy,
+                xy + wh,
+                rng.uniform(0.25, 1, detections),
+                rng.integers(0, 10, detections),
+            ]
+        ).astype(np.float32)
+        masks = None
+        if with_masks:
+            # Маски панели в разрешении входа модели, как у сегментации
+            masks = torch.from_numpy(np.zeros((detections, 640, 640), dtype=np.float32))
+        results.append(
+            Results(
+                np.zeros((size * 3 // 4, size, 3), dtype=np.uint8),
+                f"image{i}.jpg",
+                names,
+                boxes=torch.from_numpy(boxes),
+                masks=masks,
+            )
+        )
+    return results
+
+
+def measure(
+    extract: Callable[[List[Results]], List],
+    batch: int,
+    detections: int,
+    size: int,
+    with_masks: bool,
+) -> Dict[str, float]:
+    """Измеряет память после извлечения, пока батч еще обрабатывается."""
+
+    gc.collect()
+    tracemalloc.start()
+    results = make_results(batch, detections, size, with_masks)
+    snapshot = tracemalloc.take_snapshot()
+
+    start = time.perf_counter()
+    objects = extract(results)
+    elapsed = time.perf_counter() - start
+
+    # Вызывающий код еще держит список результатов, как в get_predictions_batch
+    during_batch = tracemalloc.get_traced_memory()[0]
+    blocks = sum(
+        stat.count_diff
+        for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+        if stat.count_diff > 0
+    )
+    del results
+    gc.collect()
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+
+    return {
+        "held_during_batch_mb": during_batch / 2**20,
+        "result_bytes": kept,
+        "blocks": blocks,
+        "extract_us": elapsed / batch * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--size", type=int, default=1280)
+    args = parser.parse_args()
+
+    cases = [("panels", 1, True), ("digits", 12, False), ("digits", 64, False)]
+    for kind, detections, with_masks in cases:
+        print(f"{kind}, {detections} объектов на изображение, батч {args.batch}:")
+        for name, extract in (
+            ("списки", legacy_extract),
+            ("массивы", extract_detected_object_from_results),
+        ):
+            stats = measure(extract, args.batch, detections, args.size, with_masks)
+            print(
+                f"  {name:<8} в памяти до конца батча={stats['held_during_batch_mb']:8.1f} МБ  "
+                f"результат={stats['result_bytes'] / args.batch:8.0f} Б/изобр.  "
+                f"аллокаций={stats['blocks'] / args.batch:6.0f}/изобр.  "
+                f"извлечение={stats['extract_us']:6.0f} мкс/изобр."
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Сравнивает постобработку цифр на pandas/shapely с векторизованной на NumPy.
+
+Запуск из каталога app: python -m benchmarks.postprocess
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from shapely import Polygon
+
+from src.postprocess import intersects_box, suppress_duplicates
+
+
+def build_polygon(coords: list[int]) -> Polygon:
+    """Строит полигон по координатам (прежняя реализация)."""
+    return Polygon(
+        [
+            (coords[0], coords[1]),
+            (coords[2], coords[1]),
+            (coords[2], coords[3]),
+            (coords[0], coords[3]),
+        ]
+    )
+
+
+def legacy_postprocess(
+    cls: list[int], conf: list[float], xyxy: list[list[int]], panel: list[int]
+) -> pd.DataFrame:
+    """Прежняя постобработка: DataFrame, соседние пары и полигоны shapely."""
+
+    df = pd.DataFrame({"cls": cls, "conf": conf, "xyxy": xyxy})
+    df[["x1", "y1", "x2", "y2"]] = pd.DataFrame(df["xyxy"].tolist(), index=df.index)
+    df.sort_values(by="x1", inplace=True, ignore_index=True)
+
+    idx_for_drop = []
+    for i in range(1, len(df)):
+        poly1 = build_polygon(df.iloc[i - 1]["xyxy"])
+        poly2 = build_polygon(df.iloc[i]["xyxy"])
+        overlap = poly1.intersection(poly2).area / poly1.area
+        if overlap > 0.5:
+            idx_for_drop.append(df.iloc[i - 1 : i + 1]["conf"].idxmin())
+    df.drop(idx_for_drop, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    panel_poly = build_polygon(panel)
+    df["inside_panel"] = df.apply(
+        lambda row: build_polygon(
+            [row["x1"], row["y1"], row["x2"], row["y2"]]
+        ).intersects(panel_poly),
+        axis=1,
+    )
+    return df[df["inside_panel"]]
+
+
+def vectorized_postprocess(
+    boxes: np.ndarray, conf: np.ndarray, panel: np.ndarray, adjacent_only: bool = False
+) -> np.ndarray:
+    """Новая постобработка на массивах NumPy."""
+
+    keep = suppress_duplicates(boxes, conf, adjacent_only=adjacent_only)
+    return keep[intersects_box(boxes[keep], panel)]
+
+
+def make_boxes(n: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Генерирует рамки цифр в ряд с частичными дубликатами."""
+
+    x1 = np.sort(rng.integers(0, 40 * n, n))
+    y1 = rng.integers(0, 20, n)
+    boxes = np.stack([x1, y1, x1 + 30, y1 + 50], axis=1)
+    conf = rng.random(n).astype(np.float32)
+    return boxes, conf
+
+
+def measure(fn, repeats: int) -> float:
+    """Возвращает среднее время вызова в миллисекундах."""
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 500])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        boxes, conf = make_boxes(n, rng)
+        panel = np.array([0, 0, 20 * n, 60])
+        cls, conf_list, xyxy = [0] * n, conf.tolist(), boxes.tolist()
+        legacy = measure(
+            lambda: legacy_postprocess(cls, conf_list, xyxy, panel.tolist()),
+            args.repeats,
+        )
+        vectorized = measure(
+            lambda: vectorized_postprocess(boxes, conf, panel), args.repeats
+        )
+        same = (
+            legacy_postprocess(cls, conf_list, xyxy, panel.tolist())["xyxy"].tolist()
+            == boxes[vectorized_postprocess(boxes, conf, panel, True)].tolist()
+        )
+        print(
+            f"N={n:<5} pandas/shapely={legacy:9.3f} ms  "
+            f"numpy={vectorized:8.3f} ms  speedup={legacy / vectorized:6.1f}x  "
+            f"legacy parity (adjacent_only)={same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Сравнивает препроцессинг кадров в каждой модели и общий для обеих моделей.
+
+Отдельно замеряется сам препроцессинг (letterbox, перенос на устройство,
+нормализация): дважды внутри ultralytics против одного `prepare_batch`,
+и полный `get_predictions_batch` с `PIPELINE_SHARED_PREPROCESS` и без.
+Кадры уменьшаются до `--size` по длинной стороне, как после декодирования.
+
+Запуск из каталога app: python -m benchmarks.preprocess --images ../data/images
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+
+from benchmarks.common import IMAGES_DIR, load_images, print_summary, summarize
+from src.backends import Backend
+from src.config import pipeline_config
+from src.preprocess import prepare_batch
+from src.registry import registry
+from src.router import get_predictions_batch
+
+
+def measure(fn, repeats: int) -> list[float]:
+    """Возвращает длительности вызовов после одного прогревочного."""
+
+    fn()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=Path, default=IMAGES_DIR)
+    parser.add_argument("--size", type=int, default=1280)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = []
+    for _, img in load_images(args.images):
+        r = args.size / max(img.shape[:2])
+        frames.append(cv2.resize(img, None, fx=r, fy=r, interpolation=cv2.INTER_AREA))
+    registry.load()
+    rect = registry.backend in (Backend.TORCH_CUDA, Backend.TORCH_CPU)
+    predictors = [registry.panels.predictor, registry.digits.predictor]  # type: ignore
+
+    for batch_size in args.batch_sizes:
+        batch = (frames * batch_size)[:batch_size]
+        print(f"batch {batch_size}, {args.size}px")
+
+        def per_model() -> None:
+            for predictor in predictors:
+                predictor.preprocess(batch)
+
+        def shared() -> None:
+            prepare_batch(
+                batch, pipeline_config.img_size, rect=rect, device=registry.device
+            )
+
+        print_summary(
+            "  preprocess per model", summarize(measure(per_model, args.repeats))
+        )
+        print_summary("  preprocess shared", summarize(measure(shared, args.repeats)))
+
+        for name, enabled in (
+            ("  pipeline per model", False),
+            ("  pipeline shared", True),
+        ):
+            pipeline_config.shared_preprocess = enabled
+            latencies = measure(lambda: get_predictions_batch(batch), args.repeats)
+            print_summary(name, summarize(latencies))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Сравнивает задержку запроса с загрузкой моделей на каждый вызов и с прогретым реестром.
+
+Запуск из каталога app: python -m benchmarks.registry --images ../data/images
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from ultralytics import YOLO
+
+from benchmarks.common import IMAGES_DIR, load_images, print_summary, summarize
+from src.config import models_config
+from src.predict import predict
+from src.registry import registry
+
+
+def run_cold(images, repeats: int) -> list[float]:
+    """Создает модели заново на каждый запрос, как раньше делал сервис."""
+
+    latencies = []
+    for _ in range(repeats):
+        for _, img in images:
+            start = time.perf_counter()
+            panels = YOLO(models_config.panels_path, task="segment")
+            digits = YOLO(models_config.digits_path, task="detect")
+            predict(panels, img, device=registry.device)
+            predict(digits, img, device=registry.device)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_warm(images, repeats: int) -> list[float]:
+    """Использует модели, загруженные один раз при старте."""
+
+    latencies = []
+    for _ in range(repeats):
+        for _, img in images:
+            start = time.perf_counter()
+            predict(registry.panels, img, device=registry.device)  # type: ignore
+            predict(registry.digits, img, device=registry.device)  # type: ignore
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=Path, default=IMAGES_DIR)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    registry.load()
+    print(f"load times: {registry.load_times}")
+
+    cold = summarize(run_cold(images, args.repeats))
+    warm = summarize(run_warm(images, args.repeats))
+    print_summary("YOLO() per request", cold)
+    print_summary("warm registry", warm)
+    print(f"mean latency drop: {cold['mean_ms'] / warm['mean_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
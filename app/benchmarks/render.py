@@ -0,0 +1,107 @@
+"""Измеряет время отрисовки разметки в зависимости от числа цифр и размера изображения.
+
+Сравнивает прежнюю отрисовку (копия и смешивание всего кадра на каждую
+фигуру) с отрисовкой на одном слое за один проход.
+
+Запуск из каталога app: python -m benchmarks.render
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from src.predict import DetectedObject
+from src.visualize import (
+    COLORS,
+    FONT,
+    FONT_SCALE,
+    FONT_THICKNESS,
+    TEXT_COLOR,
+    visualize,
+)
+
+SIZES = [(640, 480), (1920, 1080), (4000, 3000)]
+DIGIT_COUNTS = [1, 8, 32]
+
+
+def legacy_rectangle(image, start_point, end_point, color, thickness, alpha=0.8):
+    """Прежняя прозрачная рамка: копия и смешивание всего кадра."""
+
+    overlay = image.copy()
+    cv2.rectangle(overlay, start_point, end_point, color, thickness)
+    return cv2.addWeighted(overlay, alpha, image, 1 - alpha, 0)
+
+
+def legacy_visualize(image, panel, digits):
+    """Прежняя отрисовка: 3N+1 полнокадровых копий и смешиваний."""
+
+    for x1, y1, x2, y2 in panel.xyxy.tolist():
+        image = legacy_rectangle(image, (x1, y1), (x2, y2), (255, 0, 0), 7)
+    for cls, (x1, y1, x2, y2) in zip(digits.cls.tolist(), digits.xyxy.tolist()):
+        image = legacy_rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 3)
+        text = digits.names[cls]
+        (text_w, text_h), _ = cv2.getTextSize(text, FONT, FONT_SCALE, FONT_THICKNESS)
+        image = legacy_rectangle(
+            image,
+            (x1 - 2, y1 - text_h - 40),
+            (x1 + text_w + 10, y1 - 10),
+            COLORS.get(cls, (0, 0, 0)),
+            -1,
+        )
+        cv2.putText(
+            image, text, (x1 + 5, y1 - 26), FONT, FONT_SCALE, TEXT_COLOR, FONT_THICKNESS
+        )
+    return image
+
+
+def make_detections(width: int, height: int, count: int):
+    """Размещает панель в центре кадра и цифры в ряд внутри нее."""
+
+    names = {i: str(i) for i in range(10)}
+    px1, py1, px2, py2 = width // 4, height // 3, 3 * width // 4, height // 2
+    step = (px2 - px1) // count
+    digits = [
+        [px1 + i * step, py1 + 10, px1 + (i + 1) * step - 2, py2 - 10]
+        for i in range(count)
+    ]
+    panel = DetectedObject("bench", {0: "Panel"}, [0], [1.0], [[px1, py1, px2, py2]])
+    digit_obj = DetectedObject(
+        "bench", names, [i % 10 for i in range(count)], [1.0] * count, digits
+    )
+    return panel, digit_obj
+
+
+def measure(fn, repeats: int) -> float:
+    """Возвращает среднее время вызова в миллисекундах."""
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for width, height in SIZES:
+        image = np.random.default_rng(0).integers(
+            0, 255, (height, width, 3), dtype=np.uint8
+        )
+        for count in DIGIT_COUNTS:
+            panel, digits = make_detections(width, height, count)
+            legacy = measure(
+                lambda: legacy_visualize(image, panel, digits), args.repeats
+            )
+            single = measure(lambda: visualize(image, [panel], [digits]), args.repeats)
+            print(
+                f"{f'{width}x{height}':<10} digits={count:<4} legacy={legacy:9.2f} ms  "
+                f"single pass={single:8.2f} ms  speedup={legacy / single:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
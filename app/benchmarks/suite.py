@@ -0,0 +1,212 @@
+"""Воспроизводимый бенчмарк конвейера распознавания и HTTP-слоя.
+
+Режим `stages` измеряет в процессе длительность каждой стадии
+(декодирование, панели, цифры, постобработка, извлечение показаний,
+отрисовка, кодирование) на изображениях из data/images.
+
+Режим `http` нагружает приложение FastAPI с заданной параллельностью:
+в процессе через ASGI или по адресу `--url` работающего сервиса.
+Отчет содержит p50/p95/p99 и число изображений в секунду.
+
+Результаты сохраняются в JSON для сравнения запусков. Работает на CPU.
+
+Запуск из каталога app:
+    python -m benchmarks.suite stages --output stages.json
+    python -m benchmarks.suite http --concurrency 16 --output http.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import torch
+from fastapi import UploadFile
+
+from benchmarks.common import IMAGES_DIR, print_summary, summarize
+from src.config import models_config
+from src.predict import (
+    extract_detected_object_from_results,
+    extract_value,
+    predict,
+    process_digits_results,
+)
+from src.registry import registry
+from src.router import image_to_array
+from src.visualize import encode_image, visualize
+
+
+def environment() -> Dict[str, object]:
+    """Описывает окружение запуска, чтобы результаты можно было сравнивать."""
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "cuda": torch.cuda.is_available(),
+        "cpu": platform.processor() or platform.machine(),
+        "backend": models_config.backend,
+    }
+
+
+def read_images(images_dir: Path) -> List[bytes]:
+    """Читает закодированные изображения из каталога."""
+
+    return [
+        path.read_bytes()
+        for path in sorted(images_dir.iterdir())
+        if path.suffix.lower() in (".jpg", ".jpeg", ".png")
+    ]
+
+
+def run_stages(images: List[bytes], repeats: int) -> Dict[str, Dict[str, float]]:
+    """Измеряет каждую стадию конвейера по отдельности."""
+
+    registry.load()
+    timings: Dict[str, List[float]] = {}
+
+    def measure(stage: str, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    for _ in range(repeats):
+        for data in images:
+            img = measure(
+                "image_to_array", image_to_array, UploadFile(io.BytesIO(data))
+            )
+            panels_results = measure(
+                "predict_panels", predict, registry.panels, img, 640, registry.device
+            )
+            digits_results = measure(
+                "predict_digits", predict, registry.digits, img, 640, registry.device
+            )
+            panels = extract_detected_object_from_results(panels_results)
+            digits = extract_detected_object_from_results(digits_results)
+            if len(digits[0]) and len(panels[0]):
+                digits = measure(
+                    "process_digits_results", process_digits_results, panels, digits
+                )
+            measure("extract_value", extract_value, digits[0])
+            rendered = measure("visualize", visualize, img, panels, digits)
+            measure("encode", encode_image, rendered)
+
+    return {stage: summarize(values) for stage, values in timings.items()}
+
+
+async def run_http(
+    images: List[bytes],
+    url: Optional[str],
+    endpoint: str,
+    concurrency: int,
+    requests: int,
+) -> Dict[str, object]:
+    """Нагружает HTTP-эндпойнт и возвращает распределение задержек и пропускную способность."""
+
+    if url is None:
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://benchmark"
+        lifespan = app.router.lifespan_context(app)
+    else:
+        transport = None
+        base_url = url
+        lifespan = None
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(client: httpx.AsyncClient, i: int) -> None:
+        data = images[i % len(images)]
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                endpoint, files={"image": (f"image_{i}.jpg", data, "image/jpeg")}
+            )
+            latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, limits=limits, timeout=120
+    ) as client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            # Дожидаемся загрузки моделей
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.5)
+            start = time.perf_counter()
+            await asyncio.gather(*(send(client, i) for i in range(requests)))
+            elapsed = time.perf_counter() - start
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "statuses": statuses,
+        "latency": summarize(latencies),
+        "images_per_s": requests / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("mode", choices=["stages", "http"])
+    parser.add_argument("--images", type=Path, default=IMAGES_DIR)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--url", help="адрес сервиса; по умолчанию приложение в процессе"
+    )
+    parser.add_argument("--endpoint", default="/image/readings")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--output", type=Path, help="JSON-файл для результатов")
+    args = parser.parse_args()
+
+    images = read_images(args.images)
+    report: Dict[str, object] = {"mode": args.mode, "environment": environment()}
+
+    if args.mode == "stages":
+        stages = run_stages(images, args.repeats)
+        for stage, stats in stages.items():
+            print_summary(stage, stats)
+        report["stages"] = stages
+    else:
+        result = asyncio.run(
+            run_http(images, args.url, args.endpoint, args.concurrency, args.requests)
+        )
+        print_summary(args.endpoint, result["latency"])  # type: ignore
+        print(
+            f"throughput: {result['images_per_s']:.2f} images/s, {result['statuses']}"
+        )
+        report["http"] = result
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Сравнивает передачу батчей кадров в процессы инференса.
+
+Обычный пул процессов сериализует кадры через pickle и канал,
+пул `shm` копирует их в кольцевой буфер разделяемой памяти и передает
+только ссылки. Модели не нужны: исполнитель лишь читает кадры, поэтому
+замер показывает чистую стоимость передачи.
+
+Запуск из каталога app: python -m benchmarks.workers --batch 16
+"""
+
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+
+from src.workers import SharedMemoryPool
+
+
+def touch(frames: List[np.ndarray]) -> List[int]:
+    """Читает по байту с каждой строки кадров, как минимум делает препроцессинг."""
+
+    return [int(frame[:, 0, 0].sum()) for frame in frames]
+
+
+def measure(executor: Executor, frames: List[np.ndarray], repeats: int) -> float:
+    """Возвращает среднее время одного батча, мс."""
+
+    executor.submit(touch, frames).result()  # прогрев
+    start = time.perf_counter()
+    for _ in range(repeats):
+        executor.submit(touch, frames).result()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--size", type=int, default=1280)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [
+        rng.integers(0, 255, (args.size * 3 // 4, args.size, 3), dtype=np.uint8)
+        for _ in range(args.batch)
+    ]
+    megabytes = sum(frame.nbytes for frame in frames) / 2**20
+    print(f"Батч {args.batch} кадров {args.size}px, {megabytes:.1f} МБ")
+
+    context = multiprocessing.get_context("spawn")
+    executors = {
+        "process (pickle)": ProcessPoolExecutor(1, mp_context=context),
+        "shm": SharedMemoryPool(1, buffer_bytes=int(megabytes * 2 + 1) << 20),
+    }
+    for name, executor in executors.items():
+        elapsed = measure(executor, frames, args.repeats)
+        print(f"  {name:<18} {elapsed:8.1f} мс/батч")
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
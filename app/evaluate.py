@@ -0,0 +1,292 @@
+"""Оценка точности распознавания показаний целиком и подбор порогов.
+
+Истинные показания зашиты в имена файлов (`id_12_value_414_676.jpg`).
+Модели прогоняются один раз с низким порогом уверенности, сырые детекции
+сохраняются компактно в `.npz`. Затем постобработка и `extract_value`
+повторяются по хранилищу для сетки порогов уверенности (PIPELINE_CONF)
+и перекрытия дубликатов (PIPELINE_OVERLAP_THRESHOLD) в пуле процессов.
+Отчет содержит долю точно распознанных показаний, посимвольную точность
+и затраченное время.
+
+Запуск из каталога app:
+    python evaluate.py --images ../data/images --store detections.npz
+    python evaluate.py --conf 0.1,0.2,0.3 --overlap 0.3,0.5,0.7 --output grid.json
+"""
+
+import argparse
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.common import IMAGES_DIR, normalize_reading, parse_ground_truth
+from src.config import decode_config, pipeline_config
+from src.decode import decode_image
+from src.predict import (
+    DetectedObject,
+    concat_objects,
+    extract_detected_object_from_results,
+    extract_value,
+    group_digits_by_panel,
+    predict,
+    process_digits_results,
+)
+from src.registry import registry
+from src.router import detect_digits_on_panels
+
+# Хранилище детекций, загруженное в процесс пула
+_store: Dict[str, np.ndarray] = {}
+
+
+def parse_grid(value: str) -> List[float]:
+    """Разбирает список порогов через запятую."""
+
+    return [float(item) for item in value.split(",") if item]
+
+
+def collect_detections(
+    images_dir: Path, store_conf: float, batch_size: int
+) -> Dict[str, np.ndarray]:
+    """Прогоняет обе модели по изображениям с истинными показаниями.
+
+    Детекции всех изображений складываются в плоские массивы, границы
+    изображений задаются смещениями (`*_offsets`).
+    """
+
+    paths = []
+    for path in sorted(images_dir.iterdir()):
+        try:
+            truth = parse_ground_truth(path)
+        except ValueError:
+            continue
+        paths.append((path, truth))
+
+    registry.load()
+    panels_all: List[DetectedObject] = []
+    digits_all: List[DetectedObject] = []
+    for start in range(0, len(paths), batch_size):
+        imgs = [
+            decode_image(io.BytesIO(path.read_bytes()), decode_config.target_size).array
+            for path, _ in paths[start : start + batch_size]
+        ]
+        panels_batch = extract_detected_object_from_results(
+            predict(
+                registry.panels,  # type: ignore
+                imgs,
+                imgsz=pipeline_config.img_size,
+                device=registry.device,
+                conf=store_conf,
+            )
+        )
+        if pipeline_config.cascade:
+            digits_batch = detect_digits_on_panels(imgs, panels_batch, store_conf)
+        else:
+            digits_batch = extract_detected_object_from_results(
+                predict(
+                    registry.digits,  # type: ignore
+                    imgs,
+                    imgsz=pipeline_config.img_size,
+                    device=registry.device,
+                    conf=store_conf,
+                )
+            )
+        panels_all.extend(panels_batch)
+        digits_all.extend(digits_batch)
+
+    def offsets(objects: List[DetectedObject]) -> np.ndarray:
+        return np.cumsum([0] + [len(obj) for obj in objects], dtype=np.int64)
+
+    panels = concat_objects("", {}, panels_all)
+    digits = concat_objects("", {}, digits_all)
+    return {
+        "names": np.asarray([path.name for path, _ in paths]),
+        "truth": np.asarray([truth for _, truth in paths]),
+        "store_conf": np.float32(store_conf),
+        "panel_offsets": offsets(panels_all),
+        "panel_boxes": panels.xyxy,
+        "panel_conf": panels.conf,
+        "digit_offsets": offsets(digits_all),
+        "digit_boxes": digits.xyxy,
+        "digit_conf": digits.conf,
+        "digit_cls": digits.cls,
+    }
+
+
+def load_store(path: Path) -> None:
+    """Загружает хранилище детекций в память процесса."""
+
+    with np.load(path) as data:
+        _store.update({key: data[key] for key in data.files})
+
+
+def replay_reading(index: int, conf: float, overlap: float) -> str:
+    """Повторяет постобработку и извлечение показаний для одного изображения."""
+
+    p0, p1 = _store["panel_offsets"][index : index + 2]
+    panel_keep = p0 + np.flatnonzero(_store["panel_conf"][p0:p1] >= conf)
+    if len(panel_keep) == 0:
+        return ""
+    panels = DetectedObject(
+        "",
+        {},
+        np.zeros(len(panel_keep)),
+        _store["panel_conf"][panel_keep],
+        _store["panel_boxes"][panel_keep],
+    )
+
+    d0, d1 = _store["digit_offsets"][index : index + 2]
+    keep = d0 + np.flatnonzero(_store["digit_conf"][d0:d1] >= conf)
+    if len(keep) == 0:
+        return ""
+    digits = DetectedObject(
+        "",
+        {},
+        _store["digit_cls"][keep],
+        _store["digit_conf"][keep],
+        _store["digit_boxes"][keep],
+    )
+    digits = process_digits_results([panels], [digits], overlap)[0]
+    # Панели упорядочены по убыванию уверенности, как в ответе модели;
+    # на фото датасета один счетчик -- берем самую уверенную панель
+    return extract_value(group_digits_by_panel(panels, digits)[0])
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Расстояние Левенштейна между строками цифр."""
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def evaluate_setting(setting: Tuple[float, float]) -> Dict[str, float]:
+    """Считает точность показаний для пары порогов."""
+
+    conf, overlap = setting
+    start = time.perf_counter()
+    exact = digits_total = digit_errors = 0
+    for index, truth in enumerate(_store["truth"]):
+        predicted = normalize_reading(replay_reading(index, conf, overlap))
+        truth = normalize_reading(str(truth))
+        exact += predicted == truth
+        digits_total += len(truth)
+        digit_errors += min(edit_distance(predicted, truth), len(truth))
+
+    n = len(_store["truth"])
+    return {
+        "conf": conf,
+        "overlap": overlap,
+        "exact_match": exact / n if n else 0.0,
+        "digit_accuracy": 1 - digit_errors / digits_total if digits_total else 0.0,
+        "replay_s": time.perf_counter() - start,
+    }
+
+
+def run_grid(
+    store_path: Path,
+    settings: List[Tuple[float, float]],
+    workers: Optional[int],
+) -> List[Dict[str, float]]:
+    """Перебирает сетку порогов в пуле процессов."""
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=load_store, initargs=(store_path,)
+    ) as executor:
+        return list(executor.map(evaluate_setting, settings))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Оценка точности показаний и подбор порогов постобработки."
+    )
+    parser.add_argument("--images", type=Path, default=IMAGES_DIR)
+    parser.add_argument("--store", type=Path, default=Path("detections.npz"))
+    parser.add_argument("--rebuild", action="store_true", help="заново прогнать модели")
+    parser.add_argument(
+        "--store-conf",
+        type=float,
+        default=0.05,
+        help="порог уверенности при сохранении сырых детекций",
+    )
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument(
+        "--conf", type=parse_grid, default=parse_grid("0.1,0.15,0.2,0.25,0.3,0.4,0.5")
+    )
+    parser.add_argument(
+        "--overlap", type=parse_grid, default=parse_grid("0.3,0.4,0.5,0.6,0.7,0.8")
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", type=Path, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    if args.rebuild or not args.store.exists():
+        start = time.perf_counter()
+        store = collect_detections(args.images, args.store_conf, args.batch_size)
+        np.savez_compressed(args.store, **store)
+        print(
+            f"Детекции {len(store['names'])} изображений сохранены в {args.store} "
+            f"за {time.perf_counter() - start:.1f} с "
+            f"({args.store.stat().st_size / 1024:.1f} КБ)"
+        )
+
+    load_store(args.store)
+    store_conf = float(_store["store_conf"])
+    if min(args.conf) < store_conf:
+        parser.error(
+            f"--conf below the stored threshold {store_conf}; rerun with --rebuild"
+        )
+
+    settings = list(product(args.conf, args.overlap))
+    start = time.perf_counter()
+    results = run_grid(args.store, settings, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'conf':>6} {'overlap':>8} {'exact':>8} {'digits':>8}")
+    for result in sorted(results, key=lambda r: (-r["exact_match"], r["conf"])):
+        print(
+            f"{result['conf']:>6.2f} {result['overlap']:>8.2f} "
+            f"{result['exact_match']:>8.1%} {result['digit_accuracy']:>8.1%}"
+        )
+    current = next(
+        (
+            r
+            for r in results
+            if r["conf"] == pipeline_config.conf
+            and r["overlap"] == pipeline_config.overlap_threshold
+        ),
+        None,
+    )
+    if current is not None:
+        print(
+            f"Текущие пороги: exact={current['exact_match']:.1%} "
+            f"digits={current['digit_accuracy']:.1%}"
+        )
+    print(
+        f"{len(settings)} настроек x {len(_store['truth'])} изображений "
+        f"за {elapsed:.2f} с"
+    )
+
+    if args.output:
+        args.output.write_text(
+            json.dumps({"store": str(args.store), "results": results}, indent=2),
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,60 @@
-from typing import Dict
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from src.router import router
+from src.metrics import REGISTRY, REQUEST_TIMINGS, format_server_timing
+from src.jobs import job_manager
+from src.jobs import router as jobs_router
+from src.registry import registry
+from src.router import batcher, router
+from src.video import router as video_router
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Загружает модели в фоне, чтобы сервис сразу отвечал на проверки готовности.
+
+    Если инференс выполняется в процессах пула, модели загружают только они.
+    """
+
+    loading = None
+    if batcher.in_process:
+        loading = asyncio.create_task(asyncio.to_thread(registry.load))
+    await batcher.start()
+    await asyncio.to_thread(job_manager.start)
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(job_manager.stop)
+        await batcher.stop()
+        if loading is not None and not loading.done():
+            loading.cancel()
+        registry.unload()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def server_timing(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """Добавляет в ответ заголовок Server-Timing с длительностями стадий запроса."""
+
+    timings: Dict[str, float] = {}
+    token = REQUEST_TIMINGS.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        REQUEST_TIMINGS.reset(token)
+    timings["total"] = time.perf_counter() - start
+    response.headers["Server-Timing"] = format_server_timing(timings)
+    return response
 
 
 @app.get("/", tags=["Root"])
@@ -12,4 +62,20 @@ def root() -> Dict[str, str]:
     return {"message": "Welcome to the service for recognizing water meter readings!"}
 
 
+@app.get("/ready", tags=["Root"])
+def ready() -> JSONResponse:
+    status = batcher.status()
+    if status.ready:
+        return JSONResponse({"status": "ready", "load_times": status.load_times})
+    state = "failed" if status.error else "loading"
+    return JSONResponse({"status": state, "error": status.error}, status_code=503)
+
+
+@app.get("/metrics", tags=["Root"])
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(router)
+app.include_router(video_router)
+app.include_router(jobs_router)
@@ -0,0 +1,45 @@
+from enum import Enum
+from pathlib import Path
+from typing import Union
+
+import torch
+
+
+class Backend(Enum):
+    TORCH_CUDA = "torch-cuda"
+    TORCH_CPU = "torch-cpu"
+    ONNX = "onnx"
+    OPENVINO = "openvino"
+
+
+def resolve_backend(name: str) -> Backend:
+    """Возвращает бэкенд по имени; `auto` выбирает CUDA, если она доступна."""
+
+    if name == "auto":
+        return Backend.TORCH_CUDA if torch.cuda.is_available() else Backend.TORCH_CPU
+    return Backend(name)
+
+
+def backend_device(backend: Backend) -> Union[int, str]:
+    """Возвращает устройство для вызова модели ultralytics."""
+
+    if backend == Backend.TORCH_CUDA:
+        return 0
+    if backend == Backend.ONNX and torch.cuda.is_available():
+        return 0
+    return "cpu"
+
+
+def exported_model_path(model_path: Path, backend: Backend, int8: bool = False) -> Path:
+    """Возвращает путь к весам модели для бэкенда.
+
+    Имена совпадают с теми, что создает экспорт ultralytics и `export.py`.
+    """
+
+    if backend in (Backend.TORCH_CUDA, Backend.TORCH_CPU):
+        return model_path
+    if backend == Backend.ONNX:
+        suffix = "_int8.onnx" if int8 else ".onnx"
+        return model_path.with_name(model_path.stem + suffix)
+    suffix = "_int8_openvino_model" if int8 else "_openvino_model"
+    return model_path.with_name(model_path.stem + suffix)
@@ -0,0 +1,330 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+from src.config import BatchingConfig
+from src.metrics import (
+    REQUEST_TIMINGS,
+    STAGE_ERRORS,
+    STAGE_LATENCY,
+    counter,
+    gauge,
+    histogram,
+    run_timed,
+)
+from src.registry import load_worker_registry, registry, worker_load_times
+from src.workers import SharedMemoryPool, worker_count
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE = histogram(
+    "inference_batch_size",
+    "Number of images in each inference batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+BATCH_FILL = histogram(
+    "inference_batch_fill_ratio",
+    "Batch size divided by the configured maximum batch size.",
+    buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+QUEUE_WAIT = histogram(
+    "inference_queue_wait_seconds",
+    "Time a request waits in the batching queue before its batch starts.",
+)
+QUEUE_DEPTH = gauge(
+    "inference_queue_depth", "Number of requests waiting in the batching queue."
+)
+REJECTED = counter(
+    "inference_rejected_total", "Requests rejected because the queue was full."
+)
+BUSY_WORKERS = gauge(
+    "inference_busy_workers", "Number of batches currently running in the executor."
+)
+
+
+class QueueFullError(Exception):
+    """Очередь инференса заполнена, запрос нужно повторить позже."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+def create_executor(config: BatchingConfig) -> Executor:
+    """Создает пул потоков или процессов для инференса.
+
+    `shm` -- процессы, закрепленные за ядрами и получающие кадры через
+    разделяемую память, `process` -- обычный пул с копированием кадров.
+    """
+
+    workers = worker_count(config.workers, config.worker_threads)
+    if config.executor == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+    if config.executor == "process":
+        # Fork при работающих потоках загрузки и torch/CUDA небезопасен
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=load_worker_registry,
+        )
+    if config.executor == "shm":
+        return SharedMemoryPool(
+            workers,
+            threads=config.worker_threads,
+            buffer_bytes=config.buffer_mb << 20,
+            initializer=load_worker_registry,
+        )
+    raise ValueError(f"Unknown executor type: {config.executor}")
+
+
+@dataclass
+class WorkerStatus:
+    """Готовность моделей исполнителей инференса."""
+
+    ready: bool
+    error: Optional[str] = None
+    load_times: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class _Pending(Generic[T]):
+    payload: T
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    timings: Optional[Dict[str, float]] = field(default_factory=REQUEST_TIMINGS.get)
+
+
+class MicroBatcher(Generic[T, R]):
+    """Собирает одиночные запросы в батчи и выполняет их одним вызовом.
+
+    Батч отправляется, как только набралось `max_batch_size` элементов
+    или первый элемент батча прождал `max_wait_ms`. Батчи выполняются
+    в отдельном пуле из `workers` потоков или процессов, очередь ограничена
+    `queue_size` элементами.
+    """
+
+    def __init__(
+        self, fn: Callable[[List[T]], List[R]], config: BatchingConfig
+    ) -> None:
+        self.fn = fn
+        self.config = config
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._running: Set[asyncio.Task] = set()
+        self._probe: Optional[Future] = None
+
+    @property
+    def depth(self) -> int:
+        """Количество запросов в очереди."""
+
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def in_process(self) -> bool:
+        """Инференс выполняется в основном процессе и использует его `registry`."""
+
+        return self.config.executor == "thread"
+
+    def status(self) -> WorkerStatus:
+        """Готовность моделей там, где выполняется инференс."""
+
+        if self.in_process:
+            return WorkerStatus(registry.ready, registry.error, registry.load_times)
+        if isinstance(self._executor, SharedMemoryPool):
+            return WorkerStatus(
+                self._executor.ready, self._executor.error, self._executor.info or {}
+            )
+        if self._probe is None or not self._probe.done():
+            return WorkerStatus(False)
+        if self._probe.exception() is not None:
+            return WorkerStatus(False, repr(self._probe.exception()))
+        return WorkerStatus(True, load_times=self._probe.result())
+
+    async def start(self) -> None:
+        """Запускает пул инференса и фоновую задачу сборки батчей."""
+
+        self._executor = create_executor(self.config)
+        if isinstance(self._executor, ProcessPoolExecutor):
+            # Первая задача пула завершится после загрузки моделей исполнителем
+            self._probe = self._executor.submit(worker_load_times)
+        self._slots = asyncio.Semaphore(
+            worker_count(self.config.workers, self.config.worker_threads)
+        )
+        self._queue = asyncio.Queue(maxsize=self.config.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает сборку батчей и отменяет ожидающие запросы."""
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                pending = self._queue.get_nowait()
+                pending.future.cancel()
+            QUEUE_DEPTH.set(0)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._probe = None
+
+    async def submit(self, payload: T, wait: bool = False) -> R:
+        """Ставит элемент в очередь и ждет результата его батча.
+
+        Если очередь заполнена, при `wait=False` сразу выбрасывает
+        `QueueFullError`, иначе ждет освобождения места.
+        """
+
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher is not started")
+        pending = _Pending(payload, asyncio.get_running_loop().create_future())
+        if wait:
+            await self._queue.put(pending)
+        else:
+            try:
+                self._queue.put_nowait(pending)
+            except asyncio.QueueFull:
+                REJECTED.inc()
+                raise QueueFullError(self.config.retry_after_s) from None
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return await pending.future
+
+    async def _collect(self, first: _Pending) -> List[_Pending]:
+        """Добирает батч к первому элементу до лимита размера или времени."""
+
+        assert self._queue is not None
+        batch = [first]
+        deadline = batch[0].enqueued_at + self.config.max_wait_ms / 1000
+        while len(batch) < self.config.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Забираем все, что уже лежит в очереди, без ожидания
+        while len(batch) < self.config.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    async def _run(self) -> None:
+        assert self._slots is not None
+        while True:
+            first = await self._queue.get()  # type: ignore
+            # Исполнитель занимается только под готовый запрос, чтобы простаивающая
+            # сборка батчей не мешала `run`. Пока все исполнители заняты,
+            # запросы продолжают копиться в очереди
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                first.future.cancel()
+                raise
+            try:
+                batch = await self._collect(first)
+            except BaseException:
+                self._slots.release()
+                first.future.cancel()
+                raise
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        assert self._slots is not None
+        self._running.discard(task)
+        self._slots.release()
+
+    async def _run_batch(self, batch: List[_Pending]) -> None:
+        """Выполняет батч в пуле и раздает результаты ожидающим запросам."""
+
+        started = time.perf_counter()
+        for pending in batch:
+            QUEUE_WAIT.observe(started - pending.enqueued_at)
+            if pending.timings is not None:
+                pending.timings["queue"] = started - pending.enqueued_at
+        BATCH_SIZE.observe(len(batch))
+        BATCH_FILL.observe(len(batch) / self.config.max_batch_size)
+
+        # Запросы, клиенты которых уже отключились, не обрабатываем
+        batch = [pending for pending in batch if not pending.future.done()]
+        if not batch:
+            return
+
+        payloads = [pending.payload for pending in batch]
+        try:
+            results, timings = await self._execute(self.fn, payloads)
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        for pending, result in zip(batch, results):
+            if pending.timings is not None:
+                for stage, seconds in timings.items():
+                    pending.timings[stage] = pending.timings.get(stage, 0.0) + seconds
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def run(
+        self, fn: Callable[[List[Any]], List[Any]], payloads: List[Any]
+    ) -> List[Any]:
+        """Выполняет `fn` над готовым списком элементов в пуле инференса, минуя очередь.
+
+        Задача занимает исполнителя наравне с батчами: длинные запросы
+        (видео) выполняются частями и не держат модели, пока ждут
+        запросы из очереди.
+        """
+
+        if self._slots is None:
+            raise RuntimeError("MicroBatcher is not started")
+        async with self._slots:
+            results, timings = await self._execute(fn, payloads)
+        request_timings = REQUEST_TIMINGS.get()
+        if request_timings is not None:
+            for stage, seconds in timings.items():
+                request_timings[stage] = request_timings.get(stage, 0.0) + seconds
+        return results
+
+    async def _execute(
+        self, fn: Callable[[List[Any]], List[Any]], payloads: List[Any]
+    ) -> Tuple[List[Any], Dict[str, float]]:
+        """Выполняет вызов в пуле и возвращает результаты с длительностями стадий."""
+
+        loop = asyncio.get_running_loop()
+        BUSY_WORKERS.inc()
+        try:
+            results, timings = await loop.run_in_executor(
+                self._executor, run_timed, fn, payloads
+            )
+        except Exception:
+            STAGE_ERRORS.inc(stage="inference")
+            raise
+        finally:
+            BUSY_WORKERS.dec()
+
+        # Метрики, записанные в дочерних процессах, учитываем в основном процессе
+        if isinstance(self._executor, (ProcessPoolExecutor, SharedMemoryPool)):
+            for stage, seconds in timings.items():
+                STAGE_LATENCY.observe(seconds, stage=stage)
+        return results, timings
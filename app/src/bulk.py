@@ -0,0 +1,66 @@
+import tarfile
+import zipfile
+from pathlib import PurePath
+from typing import BinaryIO, Iterator, List, Tuple, Union
+
+from fastapi import UploadFile
+
+from src.offline import IMAGE_SUFFIXES
+
+ZIP_SUFFIXES = {".zip"}
+TAR_SUFFIXES = {".tar", ".tgz", ".gz", ".bz2", ".xz"}
+
+
+def is_image_name(name: str) -> bool:
+    """Проверяет, что имя файла похоже на изображение."""
+
+    return PurePath(name).suffix.lower() in IMAGE_SUFFIXES
+
+
+def iter_zip(stream: BinaryIO) -> Iterator[Tuple[str, bytes]]:
+    """Поочередно читает изображения из zip-архива."""
+
+    with zipfile.ZipFile(stream) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not is_image_name(info.filename):
+                continue
+            yield info.filename, archive.read(info)
+
+
+def iter_tar(stream: BinaryIO) -> Iterator[Tuple[str, bytes]]:
+    """Поочередно читает изображения из tar-архива в потоковом режиме."""
+
+    with tarfile.open(fileobj=stream, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or not is_image_name(member.name):
+                continue
+            extracted = archive.extractfile(member)
+            if extracted is not None:
+                yield member.name, extracted.read()
+
+
+def iter_upload_images(
+    files: List[UploadFile],
+) -> Iterator[Tuple[str, Union[bytes, Exception]]]:
+    """Перебирает изображения из загруженных файлов и архивов по одному.
+
+    В памяти одновременно находится только текущее изображение:
+    FastAPI сам сбрасывает крупные загрузки во временные файлы на диске.
+    Если архив поврежден, вместо данных возвращается ошибка с именем
+    архива, а перебор продолжается со следующей загрузки.
+    """
+
+    for upload in files:
+        name = upload.filename or "image"
+        suffix = PurePath(name).suffix.lower()
+        if suffix in ZIP_SUFFIXES:
+            images = iter_zip(upload.file)
+        elif suffix in TAR_SUFFIXES:
+            images = iter_tar(upload.file)
+        else:
+            yield name, upload.file.read()
+            continue
+        try:
+            yield from images
+        except Exception as e:
+            yield name, e
@@ -0,0 +1,289 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.backends import exported_model_path, resolve_backend
+from src.config import CacheConfig, DecodeConfig, ModelsConfig, PipelineConfig
+from src.metrics import counter, gauge
+from src.predict import DetectedObject, shared_names
+
+Predictions = Tuple[List[DetectedObject], List[DetectedObject]]
+
+CACHE_REQUESTS = counter(
+    "result_cache_requests_total",
+    "Result cache lookups by tier and outcome.",
+    ("tier", "result"),
+)
+CACHE_EVICTIONS = counter(
+    "result_cache_evictions_total", "Entries evicted from the in-memory tier."
+)
+CACHE_BYTES = gauge("result_cache_bytes", "Size of the in-memory tier in bytes.")
+CACHE_ENTRIES = gauge(
+    "result_cache_entries", "Number of entries in the in-memory tier."
+)
+
+# Как часто (в записях) проверять размер дискового уровня
+DISK_PRUNE_INTERVAL = 256
+
+
+def content_key(data: bytes) -> str:
+    """Возвращает ключ кэша по содержимому загруженного файла."""
+
+    return hashlib.sha256(data).hexdigest()
+
+
+@functools.lru_cache(maxsize=16)
+def file_digest(path: str, size: int, mtime_ns: int) -> str:
+    """Хэш содержимого файла; размер и время изменения сбрасывают запомненный хэш."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def path_digest(path: Path) -> str:
+    """Хэш весов модели: файла или всех файлов каталога (OpenVINO)."""
+
+    if not path.exists():
+        return "missing"
+    files = (
+        [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+    )
+    digest = hashlib.sha256()
+    for file in files:
+        stat = file.stat()
+        digest.update(file.relative_to(path.parent).as_posix().encode("utf-8"))
+        digest.update(file_digest(str(file), stat.st_size, stat.st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+def results_fingerprint(
+    models: ModelsConfig, pipeline: PipelineConfig, decode: DecodeConfig
+) -> str:
+    """Отпечаток всего, от чего зависят детекции в кэше.
+
+    Учитываются веса моделей выбранного бэкенда, сам бэкенд и настройки
+    конвейера и декодирования: координаты в кэше заданы в системе
+    декодированного изображения.
+    """
+
+    backend = resolve_backend(models.backend)
+    params = {
+        "weights": [
+            path_digest(exported_model_path(path, backend, models.int8))
+            for path in (models.panels_path, models.digits_path)
+        ],
+        "backend": backend.value,
+        "int8": models.int8,
+        "pipeline": asdict(pipeline),
+        "decode": asdict(decode),
+    }
+    payload = json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def perceptual_key(image: np.ndarray) -> str:
+    """Возвращает разностный хэш (dHash) изображения.
+
+    Хэш не меняется при перекодировании копии. Размер изображения входит
+    в ключ, чтобы координаты из кэша совпадали с системой координат копии.
+    """
+
+    if image.ndim == 2:
+        gray = image
+    else:
+        gray = cv2.cvtColor(np.ascontiguousarray(image[..., :3]), cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = int("".join("1" if bit else "0" for bit in bits), 2)
+    return f"p{image.shape[0]}x{image.shape[1]}_{value:016x}"
+
+
+def serialize_predictions(predictions: Predictions) -> bytes:
+    """Сохраняет только компактные детекции, без изображений."""
+
+    panels, digits = predictions
+    data = {
+        kind: [
+            {
+                "image": obj.image,
+                "names": obj.names,
+                "cls": obj.cls.tolist(),
+                "conf": obj.conf.tolist(),
+                "xyxy": obj.xyxy.tolist(),
+            }
+            for obj in objects
+        ]
+        for kind, objects in (("panels", panels), ("digits", digits))
+    }
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def deserialize_predictions(payload: bytes) -> Predictions:
+    """Восстанавливает детекции из записи кэша."""
+
+    data = json.loads(payload)
+
+    def restore(obj: Dict) -> DetectedObject:
+        names = shared_names({int(key): value for key, value in obj["names"].items()})
+        return DetectedObject(obj["image"], names, obj["cls"], obj["conf"], obj["xyxy"])
+
+    return [restore(obj) for obj in data["panels"]], [
+        restore(obj) for obj in data["digits"]
+    ]
+
+
+class ResultCache:
+    """LRU-кэш результатов инференса с TTL и дисковым уровнем.
+
+    В памяти хранятся сериализованные детекции, поэтому каждый вызов `get`
+    возвращает независимую копию. Дисковый уровень переживает перезапуск.
+    Ключи записей дополняются отпечатком `fingerprint()` моделей и настроек,
+    поэтому после их смены старые результаты не отдаются. Методы выполняют
+    дисковый ввод-вывод и вызываются вне цикла событий.
+    """
+
+    def __init__(
+        self, config: CacheConfig, fingerprint: Callable[[], str] = lambda: ""
+    ) -> None:
+        self.config = config
+        self.fingerprint = fingerprint
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._size = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.disk_path = Path(config.disk_path) if config.disk_path else None
+
+    def get(self, key: str) -> Optional[Predictions]:
+        """Ищет результат в памяти, затем на диске."""
+
+        if not self.config.enabled:
+            return None
+
+        key = self._namespaced(key)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    CACHE_REQUESTS.inc(tier="memory", result="hit")
+                    return deserialize_predictions(payload)
+                self._remove(key)
+        CACHE_REQUESTS.inc(tier="memory", result="miss")
+
+        if self.disk_path is None:
+            return None
+        payload = self._read_disk(key, now)
+        if payload is None:
+            CACHE_REQUESTS.inc(tier="disk", result="miss")
+            return None
+        CACHE_REQUESTS.inc(tier="disk", result="hit")
+        with self._lock:
+            self._store(key, payload, now + self.config.ttl_s)
+        return deserialize_predictions(payload)
+
+    def put(self, keys: List[str], predictions: Predictions) -> None:
+        """Сохраняет результат под всеми переданными ключами."""
+
+        if not self.config.enabled:
+            return
+
+        namespace = self.fingerprint()
+        keys = [f"{namespace}/{key}" for key in keys]
+        payload = serialize_predictions(predictions)
+        expires_at = time.time() + self.config.ttl_s
+        with self._lock:
+            for key in keys:
+                self._store(key, payload, expires_at)
+        if self.disk_path is not None:
+            for key in keys:
+                self._write_disk(key, payload, expires_at)
+
+    def _namespaced(self, key: str) -> str:
+        return f"{self.fingerprint()}/{key}"
+
+    def _store(self, key: str, payload: bytes, expires_at: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (payload, expires_at)
+        self._size += len(payload)
+        while self._size > self.config.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            CACHE_EVICTIONS.inc()
+        CACHE_BYTES.set(self._size)
+        CACHE_ENTRIES.set(len(self._entries))
+
+    def _remove(self, key: str) -> None:
+        payload, _ = self._entries.pop(key)
+        self._size -= len(payload)
+
+    def _disk_file(self, key: str) -> Path:
+        namespace, key = key.split("/", 1)
+        return self.disk_path / namespace / key[:2] / f"{key}.json"  # type: ignore
+
+    def _read_disk(self, key: str, now: float) -> Optional[bytes]:
+        path = self._disk_file(key)
+        try:
+            record = json.loads(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        if record["expires_at"] <= now:
+            path.unlink(missing_ok=True)
+            return None
+        return json.dumps(record["value"], separators=(",", ":")).encode("utf-8")
+
+    def _write_disk(self, key: str, payload: bytes, expires_at: float) -> None:
+        path = self._disk_file(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        record = b'{"expires_at":%r,"value":%s}' % (expires_at, payload)
+        # Запись через временный файл, чтобы не оставлять обрезанных записей
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(record)
+        tmp_path.replace(path)
+
+        self._puts += 1
+        if self._puts % DISK_PRUNE_INTERVAL == 0:
+            self.prune_disk()
+
+    def prune_disk(self) -> None:
+        """Удаляет просроченные записи и самые старые, если уровень превышает лимит.
+
+        Просматриваются все отпечатки, так что записи прежних моделей и
+        настроек тоже удаляются по сроку и размеру.
+        """
+
+        if self.disk_path is None or not self.disk_path.exists():
+            return
+
+        files = []
+        for path in self.disk_path.rglob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if stat.st_mtime + self.config.ttl_s <= time.time():
+                path.unlink(missing_ok=True)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.config.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,186 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+
+def env_str(name: str, default: str) -> str:
+    """Возвращает строковое значение переменной окружения."""
+    return os.getenv(name, default)
+
+
+def env_int(name: str, default: int) -> int:
+    """Возвращает целочисленное значение переменной окружения."""
+    return int(os.getenv(name, default))
+
+
+def env_float(name: str, default: float) -> float:
+    """Возвращает вещественное значение переменной окружения."""
+    return float(os.getenv(name, default))
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Возвращает логическое значение переменной окружения."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class ModelsConfig:
+    panels_path: Path
+    digits_path: Path
+    warmup_size: int
+    backend: str
+    int8: bool
+
+
+# Конфигурация моделей
+models_config = ModelsConfig(
+    panels_path=Path(env_str("MODEL_PANELS", "models/panels_base.pt")),
+    digits_path=Path(env_str("MODEL_DIGITS", "models/digits_base.pt")),
+    warmup_size=env_int("MODEL_WARMUP_SIZE", 640),
+    backend=env_str("INFERENCE_BACKEND", "auto"),
+    int8=env_bool("INFERENCE_INT8", False),
+)
+
+
+@dataclass
+class BatchingConfig:
+    max_batch_size: int
+    max_wait_ms: float
+    executor: str
+    workers: int
+    worker_threads: int
+    buffer_mb: int
+    queue_size: int
+    retry_after_s: int
+
+
+# Конфигурация динамического объединения запросов в батчи и пула инференса.
+# Для пула `shm` число исполнителей 0 означает "по числу доступных ядер"
+batching_config = BatchingConfig(
+    max_batch_size=env_int("BATCH_MAX_SIZE", 16),
+    max_wait_ms=env_float("BATCH_MAX_WAIT_MS", 10.0),
+    executor=env_str("INFERENCE_EXECUTOR", "thread"),
+    workers=env_int("INFERENCE_WORKERS", 1),
+    worker_threads=env_int("INFERENCE_WORKER_THREADS", 1),
+    buffer_mb=env_int("INFERENCE_BUFFER_MB", 64),
+    queue_size=env_int("INFERENCE_QUEUE_SIZE", 64),
+    retry_after_s=env_int("INFERENCE_RETRY_AFTER", 1),
+)
+
+
+@dataclass
+class PipelineConfig:
+    cascade: bool
+    panel_padding: float
+    digits_img_size: int
+    conf: float
+    overlap_threshold: float
+    img_size: int
+    shared_preprocess: bool
+
+
+# Конфигурация каскада (цифры ищутся только на вырезке панели), порогов
+# постобработки (подбираются скриптом evaluate.py) и общего препроцессинга
+# кадра для моделей панелей и цифр
+pipeline_config = PipelineConfig(
+    cascade=env_bool("PIPELINE_CASCADE", False),
+    panel_padding=env_float("PIPELINE_PANEL_PADDING", 0.1),
+    digits_img_size=env_int("PIPELINE_DIGITS_IMG_SIZE", 640),
+    conf=env_float("PIPELINE_CONF", 0.25),
+    overlap_threshold=env_float("PIPELINE_OVERLAP_THRESHOLD", 0.5),
+    img_size=env_int("PIPELINE_IMG_SIZE", 640),
+    shared_preprocess=env_bool("PIPELINE_SHARED_PREPROCESS", True),
+)
+
+
+@dataclass
+class CacheConfig:
+    enabled: bool
+    max_bytes: int
+    ttl_s: float
+    disk_path: str
+    disk_max_bytes: int
+    perceptual: bool
+
+
+# Конфигурация кэша результатов (пустой disk_path отключает дисковый уровень)
+cache_config = CacheConfig(
+    enabled=env_bool("CACHE_ENABLED", True),
+    max_bytes=env_int("CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    ttl_s=env_float("CACHE_TTL_S", 24 * 60 * 60),
+    disk_path=env_str("CACHE_DISK_PATH", "cache/results"),
+    disk_max_bytes=env_int("CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024),
+    perceptual=env_bool("CACHE_PERCEPTUAL", False),
+)
+
+
+@dataclass
+class OverlayConfig:
+    ttl_s: float
+    max_bytes: int
+
+
+# Отложенная отрисовка разметки для /image/analyze: ссылка живет ttl_s секунд,
+# загруженные фото и готовые изображения занимают в памяти не больше max_bytes
+overlay_config = OverlayConfig(
+    ttl_s=env_float("OVERLAY_TTL_S", 300.0),
+    max_bytes=env_int("OVERLAY_MAX_BYTES", 128 * 1024 * 1024),
+)
+
+
+@dataclass
+class DecodeConfig:
+    target_size: int
+
+
+# Минимальная сторона, до которой JPEG может уменьшаться при декодировании (0 -- без уменьшения)
+decode_config = DecodeConfig(target_size=env_int("DECODE_TARGET_SIZE", 1280))
+
+
+@dataclass
+class VideoConfig:
+    sample_fps: float
+    keyframe_interval: int
+    max_frames: int
+    max_concurrent: int
+
+
+# Конфигурация чтения видео: частота выборки кадров, интервал ключевых кадров
+# и число одновременно распознаваемых видео (остальные получают 503)
+video_config = VideoConfig(
+    sample_fps=env_float("VIDEO_SAMPLE_FPS", 5.0),
+    keyframe_interval=env_int("VIDEO_KEYFRAME_INTERVAL", 10),
+    max_frames=env_int("VIDEO_MAX_FRAMES", 300),
+    max_concurrent=env_int("VIDEO_MAX_CONCURRENT", 2),
+)
+
+
+@dataclass
+class JobsConfig:
+    db_path: Path
+    storage_path: Path
+    workers: int
+    batch_size: int
+    max_attempts: int
+    poll_interval_s: float
+    max_wait_s: float
+    paths_root: str
+
+
+# Конфигурация фоновых заданий: очередь в SQLite и пул процессов-исполнителей.
+# Исполнители включаются явно (workers > 0): каждый загружает свою копию моделей.
+# Элемент, при котором исполнитель упал max_attempts раз, помечается ошибкой.
+# Пути на сервере принимаются только внутри paths_root (пусто -- запрещены)
+jobs_config = JobsConfig(
+    db_path=Path(env_str("JOBS_DB_PATH", "cache/jobs.sqlite3")),
+    storage_path=Path(env_str("JOBS_STORAGE_PATH", "cache/jobs")),
+    workers=env_int("JOBS_WORKERS", 0),
+    batch_size=env_int("JOBS_BATCH_SIZE", 16),
+    max_attempts=env_int("JOBS_MAX_ATTEMPTS", 3),
+    poll_interval_s=env_float("JOBS_POLL_INTERVAL_S", 0.5),
+    max_wait_s=env_float("JOBS_MAX_WAIT_S", 30.0),
+    paths_root=env_str("JOBS_PATHS_ROOT", ""),
+)
@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+
+@dataclass
+class DecodedImage:
+    array: np.ndarray
+    scale: float
+
+
+def probe_scale(stream: BinaryIO, target_size: Optional[int]) -> float:
+    """Возвращает масштаб уменьшенного декодирования, читая только заголовок."""
+
+    img = Image.open(stream)
+    width = img.width
+    if target_size and img.format == "JPEG":
+        img.draft("RGB", (target_size, target_size))
+    return img.width / width
+
+
+def decode_image(stream: BinaryIO, target_size: Optional[int] = None) -> DecodedImage:
+    """Декодирует изображение в непрерывный массив RGB uint8.
+
+    Учитывает ориентацию из EXIF и приводит RGBA, палитровые и
+    полутоновые изображения к RGB. `scale` -- отношение ширины
+    декодированного изображения к исходной.
+    """
+
+    img = Image.open(stream)
+    width = img.width
+    if target_size and img.format == "JPEG":
+        img.draft("RGB", (target_size, target_size))
+    scale = img.width / width
+
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return DecodedImage(np.ascontiguousarray(np.asarray(img)), scale)
@@ -0,0 +1,473 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from multiprocessing.synchronize import Event
+from pathlib import Path, PurePath
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from src.bulk import iter_upload_images
+from src.config import JobsConfig, jobs_config
+from src.metrics import counter
+from src.workers import restart_time
+
+logger = logging.getLogger(__name__)
+
+JOBS_SUBMITTED = counter("jobs_submitted_total", "Jobs accepted by the job API.")
+JOB_WORKER_RESTARTS = counter(
+    "jobs_worker_restarts_total", "Job worker processes restarted after a crash."
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    owned INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status);
+"""
+
+# Элемент задания: номер, имя файла, путь к изображению и признак того,
+# что файл загружен в хранилище сервиса и удаляется после обработки
+Item = Tuple[str, int, str, str, bool]
+
+
+class JobStore:
+    """Персистентная очередь заданий в SQLite.
+
+    Каждое изображение задания -- отдельная строка `items`, поэтому после
+    перезапуска повторяется только то, что не было дообработано.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            yield connection
+        finally:
+            connection.close()
+
+    def init(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as connection:
+            connection.executescript(SCHEMA)
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(items)")}
+            if "attempts" not in columns:
+                # База, созданная до учета попыток
+                connection.execute(
+                    "ALTER TABLE items ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def create_job(self, job_id: str, items: List[Tuple[str, str, bool]]) -> None:
+        """Сохраняет задание и его элементы одной транзакцией."""
+
+        with self.connect() as connection:
+            connection.execute("BEGIN")
+            connection.execute(
+                "INSERT INTO jobs (id, created_at, total) VALUES (?, ?, ?)",
+                (job_id, time.time(), len(items)),
+            )
+            connection.executemany(
+                "INSERT INTO items (job_id, seq, name, path, owned) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (job_id, seq, name, path, int(owned))
+                    for seq, (name, path, owned) in enumerate(items)
+                ),
+            )
+            connection.execute("COMMIT")
+
+    def claim(self, worker: int, limit: int) -> List[Item]:
+        """Забирает в работу до `limit` ожидающих элементов в порядке поступления.
+
+        Элементы, при которых исполнитель уже падал, забираются по одному,
+        чтобы повторное падение не засчитывалось соседям по батчу.
+        """
+
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute(
+                "SELECT rowid, job_id, seq, name, path, owned, attempts FROM items "
+                "WHERE status = 'pending' ORDER BY rowid LIMIT ?",
+                (limit,),
+            ).fetchall()
+            rows = [row for row in rows if row[6]][:1] or rows
+            connection.executemany(
+                "UPDATE items SET status = 'running', worker = ?, "
+                "attempts = attempts + 1 WHERE rowid = ?",
+                ((worker, row[0]) for row in rows),
+            )
+            connection.execute("COMMIT")
+        return [
+            (job_id, seq, name, path, bool(owned))
+            for _, job_id, seq, name, path, owned, _ in rows
+        ]
+
+    def complete(
+        self, records: List[Tuple[str, int, Optional[str], Optional[str]]]
+    ) -> None:
+        """Сохраняет результаты (job_id, seq, result, error) обработанных элементов."""
+
+        with self.connect() as connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "UPDATE items SET status = ?, result = ?, error = ?, worker = NULL "
+                "WHERE job_id = ? AND seq = ?",
+                (
+                    ("failed" if error else "done", result, error, job_id, seq)
+                    for job_id, seq, result, error in records
+                ),
+            )
+            connection.execute("COMMIT")
+
+    def requeue(
+        self, max_attempts: int, worker: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """Возвращает в очередь элементы упавшего исполнителя (или всех).
+
+        Элементы, исчерпавшие `max_attempts` попыток, помечаются ошибкой.
+        Возвращает число возвращенных в очередь и отклоненных элементов.
+        """
+
+        condition = "status = 'running'"
+        params: Tuple = ()
+        if worker is not None:
+            condition += " AND worker = ?"
+            params = (worker,)
+        with self.connect() as connection:
+            connection.execute("BEGIN")
+            failed = connection.execute(
+                "UPDATE items SET status = 'failed', worker = NULL, "
+                "error = 'Job worker exited ' || attempts || ' times on this item' "
+                f"WHERE {condition} AND attempts >= ?",
+                (*params, max_attempts),
+            ).rowcount
+            requeued = connection.execute(
+                "UPDATE items SET status = 'pending', worker = NULL "
+                f"WHERE {condition}",
+                params,
+            ).rowcount
+            connection.execute("COMMIT")
+        return requeued, failed
+
+    def job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает прогресс задания или None, если его нет."""
+
+        with self.connect() as connection:
+            job = connection.execute(
+                "SELECT created_at, total FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            counts = dict(
+                connection.execute(
+                    "SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status",
+                    (job_id,),
+                ).fetchall()
+            )
+
+        created_at, total = job
+        status = {
+            key: counts.get(key, 0) for key in ("pending", "running", "done", "failed")
+        }
+        processed = status["done"] + status["failed"]
+        if processed == total:
+            state = "done"
+        elif processed or status["running"]:
+            state = "running"
+        else:
+            state = "queued"
+        return {
+            "id": job_id,
+            "status": state,
+            "created_at": created_at,
+            "total": total,
+            "processed": processed,
+            **status,
+        }
+
+    def results(self, job_id: str, after: int, limit: int) -> List[Dict[str, Any]]:
+        """Возвращает страницу элементов задания с номерами больше `after`."""
+
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT seq, name, status, result, error FROM items "
+                "WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, after, limit),
+            ).fetchall()
+        items = []
+        for seq, name, status, result, error in rows:
+            item: Dict[str, Any] = {"seq": seq, "filename": name, "status": status}
+            if result is not None:
+                item.update(json.loads(result))
+            if error is not None:
+                item["error"] = error
+            items.append(item)
+        return items
+
+
+def process_items(
+    items: List[Item],
+) -> List[Tuple[str, int, Optional[str], Optional[str]]]:
+    """Распознает элементы задания одним батчем существующего конвейера."""
+
+    from src.router import bytes_to_image, format_readings, get_predictions_batch
+
+    records: List[Tuple[str, int, Optional[str], Optional[str]]] = []
+    decoded = []
+    for job_id, seq, _, path, _ in items:
+        try:
+            decoded.append((job_id, seq, bytes_to_image(Path(path).read_bytes())))
+        except Exception as e:
+            records.append((job_id, seq, None, f"{type(e).__name__}: {e}"))
+
+    if decoded:
+        try:
+            predictions = get_predictions_batch(
+                [image.array for _, _, image in decoded]
+            )
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            records.extend((job_id, seq, None, error) for job_id, seq, _ in decoded)
+        else:
+            for (job_id, seq, image), (panels, digits) in zip(decoded, predictions):
+                reading = format_readings(panels[0], digits[0], image.scale)
+                records.append(
+                    (job_id, seq, json.dumps(reading, ensure_ascii=False), None)
+                )
+    return records
+
+
+def run_worker(config: JobsConfig, stop: Event) -> None:
+    """Главный цикл процесса-исполнителя: забирает элементы, распознает, сохраняет."""
+
+    from src.registry import registry
+
+    registry.load()
+    store = JobStore(config.db_path)
+    worker = os.getpid()
+    while not stop.is_set():
+        items = store.claim(worker, config.batch_size)
+        if not items:
+            stop.wait(config.poll_interval_s)
+            continue
+        store.complete(process_items(items))
+        # Загруженные файлы больше не нужны: результаты уже сохранены
+        for _, _, _, path, owned in items:
+            if owned:
+                Path(path).unlink(missing_ok=True)
+        for directory in {Path(item[3]).parent for item in items if item[4]}:
+            try:
+                directory.rmdir()
+            except OSError:
+                pass  # в каталоге задания еще есть необработанные файлы
+
+
+class JobManager:
+    """Запускает процессы-исполнители и перезапускает упавшие.
+
+    Процессы создаются через spawn: к моменту запуска в основном процессе
+    уже работают потоки загрузки моделей, и fork небезопасен.
+    """
+
+    def __init__(self, config: JobsConfig) -> None:
+        self.config = config
+        self.store = JobStore(config.db_path)
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._workers: List[Tuple[multiprocessing.process.BaseProcess, float]] = []
+        self._supervisor: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.store.init()
+        # Исполнители прошлого запуска уже не работают
+        requeued, failed = self.store.requeue(self.config.max_attempts)
+        if requeued or failed:
+            logger.info(
+                "Requeued %d unfinished job items, %d failed after %d attempts",
+                requeued,
+                failed,
+                self.config.max_attempts,
+            )
+        if self.config.workers <= 0:
+            return
+        self._stop.clear()
+        self._workers = [self._spawn() for _ in range(self.config.workers)]
+        self._supervisor = threading.Thread(
+            target=self._supervise, name="jobs-supervisor", daemon=True
+        )
+        self._supervisor.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+            self._supervisor = None
+        for process, _ in self._workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
+
+    def _spawn(self) -> Tuple[multiprocessing.process.BaseProcess, float]:
+        process = self._context.Process(
+            target=run_worker,
+            args=(self.config, self._stop),
+            name="jobs-worker",
+            daemon=True,
+        )
+        process.start()
+        return process, time.monotonic()
+
+    def _supervise(self) -> None:
+        while not self._stop.wait(self.config.poll_interval_s * 4):
+            for i, (process, started_at) in enumerate(self._workers):
+                if process.is_alive():
+                    continue
+                if time.monotonic() < restart_time(started_at):
+                    continue
+                requeued, failed = self.store.requeue(
+                    self.config.max_attempts, process.pid
+                )
+                logger.warning(
+                    "Job worker %s exited with %s, %d items requeued, %d failed",
+                    process.pid,
+                    process.exitcode,
+                    requeued,
+                    failed,
+                )
+                JOB_WORKER_RESTARTS.inc()
+                self._workers[i] = self._spawn()
+
+
+job_manager = JobManager(jobs_config)
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def save_uploads(job_id: str, files: List[UploadFile]) -> List[Tuple[str, str, bool]]:
+    """Сохраняет загруженные изображения и архивы в хранилище задания."""
+
+    directory = jobs_config.storage_path / job_id
+    directory.mkdir(parents=True, exist_ok=True)
+    items = []
+    for seq, (name, data) in enumerate(iter_upload_images(files)):
+        if isinstance(data, Exception):
+            shutil.rmtree(directory, ignore_errors=True)
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot read archive {name}: {type(data).__name__}: {data}",
+            )
+        path = directory / f"{seq:07d}{PurePath(name).suffix.lower()}"
+        path.write_bytes(data)
+        items.append((name, str(path), True))
+    return items
+
+
+def resolve_paths(paths: str) -> List[Tuple[str, str, bool]]:
+    """Проверяет пути к изображениям на сервере: только внутри JOBS_PATHS_ROOT."""
+
+    if not jobs_config.paths_root:
+        raise HTTPException(status_code=400, detail="Server-side paths are disabled")
+    root = Path(jobs_config.paths_root).resolve()
+    items = []
+    for line in paths.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        path = (root / line).resolve()
+        if not path.is_relative_to(root):
+            raise HTTPException(status_code=400, detail=f"Path outside root: {line}")
+        items.append((line, str(path), False))
+    return items
+
+
+@router.post("", status_code=202)
+async def submit_job(
+    files: Optional[List[UploadFile]] = File(None),
+    paths: Optional[str] = Form(
+        None, description="пути на сервере, по одному в строке"
+    ),
+) -> Dict[str, Any]:
+    """Ставит в очередь изображения, архивы zip/tar или список путей на сервере."""
+
+    if jobs_config.workers <= 0:
+        raise HTTPException(status_code=503, detail="Job workers are disabled")
+    job_id = uuid.uuid4().hex
+    items = resolve_paths(paths) if paths else []
+    if files:
+        items += await run_in_threadpool(save_uploads, job_id, files)
+    if not items:
+        raise HTTPException(status_code=400, detail="No images in the job")
+
+    await run_in_threadpool(job_manager.store.create_job, job_id, items)
+    JOBS_SUBMITTED.inc()
+    return {"id": job_id, "total": len(items)}
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="ждать изменения прогресса, с"),
+    processed: int = Query(-1, description="прогресс, уже известный клиенту"),
+) -> JSONResponse:
+    """Возвращает прогресс задания; с `wait` отвечает, когда прогресс изменится."""
+
+    deadline = time.monotonic() + min(wait, jobs_config.max_wait_s)
+    while True:
+        status = await run_in_threadpool(job_manager.store.job_status, job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if (
+            status["processed"] != processed
+            or status["status"] == "done"
+            or time.monotonic() >= deadline
+        ):
+            return JSONResponse(status)
+        await asyncio.sleep(jobs_config.poll_interval_s)
+
+
+@router.get("/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    after: int = Query(-1, description="номер последнего полученного элемента"),
+    limit: int = Query(100, ge=1, le=1000),
+) -> Dict[str, Any]:
+    """Возвращает страницу результатов задания по порядку загрузки."""
+
+    if await run_in_threadpool(job_manager.store.job_status, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    items = await run_in_threadpool(job_manager.store.results, job_id, after, limit)
+    return {
+        "items": items,
+        "next": items[-1]["seq"] if len(items) == limit else None,
+    }
@@ -0,0 +1,68 @@
+"""Общие функции офлайн-клиентов: списки изображений и продолжение прерванных запусков.
+
+Модуль использует только стандартную библиотеку: его импортируют и
+`batch_infer.py`, и HTTP-клиент `client.py` из корня репозитория.
+"""
+
+import csv
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+# Расширения изображений: общие для офлайн-клиентов и пакетной загрузки по HTTP
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def collect_images(source: Path) -> List[Path]:
+    """Возвращает изображения из каталога (рекурсивно) или из файла-манифеста."""
+
+    if source.is_dir():
+        return sorted(
+            p for p in source.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES
+        )
+    # Манифест: по одному пути на строку, относительные пути -- от манифеста
+    paths = []
+    for line in source.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            path = Path(line)
+            paths.append(path if path.is_absolute() else source.parent / path)
+    return paths
+
+
+def read_rows(
+    output: Path, columns: Optional[List[str]] = None
+) -> Iterator[Dict[str, Any]]:
+    """Читает результаты прошлых запусков из CSV, JSONL или каталога частей Parquet.
+
+    `columns` ограничивает читаемые столбцы Parquet (нужен пакет pyarrow).
+    """
+
+    if output.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for part in sorted(output.glob("part-*.parquet")):
+            yield from pq.read_table(part, columns=columns).to_pylist()
+        return
+    with output.open(encoding="utf-8", newline="") as f:
+        if output.suffix == ".csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Строка, оборванная при аварийной остановке
+                continue
+
+
+def load_done(
+    output: Path,
+    is_done: Callable[[Dict[str, Any]], bool],
+    columns: Optional[List[str]] = None,
+) -> Set[str]:
+    """Возвращает изображения, уже успешно обработанные в прошлых запусках."""
+
+    if not output.exists():
+        return set()
+    return {row["path"] for row in read_rows(output, columns) if is_done(row)}
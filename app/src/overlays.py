@@ -0,0 +1,109 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from src.config import OverlayConfig
+from src.metrics import counter, gauge
+from src.predict import DetectedObject
+
+OVERLAY_REQUESTS = counter(
+    "overlay_requests_total",
+    "Overlays requested from /image/analyze by delivery mode.",
+    ("mode",),
+)
+OVERLAY_EVICTIONS = counter(
+    "overlay_store_evictions_total", "Pending overlays evicted before expiry."
+)
+OVERLAY_BYTES = gauge("overlay_store_bytes", "Size of the pending overlay store.")
+
+
+@dataclass
+class PendingOverlay:
+    """Все, что нужно для отрисовки разметки по ссылке без повторного инференса.
+
+    До первого запроса хранятся загруженные байты и детекции, после --
+    только готовое изображение.
+    """
+
+    data: bytes
+    panels: List[DetectedObject]
+    digits: List[DetectedObject]
+    image_format: str
+    quality: int
+    max_size: Optional[int]
+    full_resolution: bool
+    expires_at: float = 0.0
+    rendered: Optional[bytes] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.rendered if self.rendered is not None else self.data)
+
+
+class OverlayStore:
+    """Короткоживущие изображения с разметкой, доступные по случайному токену.
+
+    Хранятся в памяти процесса с вытеснением самых старых записей
+    при превышении `max_bytes`.
+    """
+
+    def __init__(self, config: OverlayConfig) -> None:
+        self.config = config
+        self._entries: "OrderedDict[str, PendingOverlay]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, overlay: PendingOverlay) -> Tuple[str, float]:
+        """Сохраняет отложенную отрисовку, возвращает токен и время жизни."""
+
+        token = secrets.token_urlsafe(16)
+        now = time.time()
+        overlay.expires_at = now + self.config.ttl_s
+        with self._lock:
+            self._prune(now)
+            self._entries[token] = overlay
+            self._size += overlay.size
+            while self._size > self.config.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                OVERLAY_EVICTIONS.inc()
+            OVERLAY_BYTES.set(self._size)
+        return token, self.config.ttl_s
+
+    def get(self, token: str) -> Optional[PendingOverlay]:
+        with self._lock:
+            overlay = self._entries.get(token)
+            if overlay is not None and overlay.expires_at <= time.time():
+                self._remove(token)
+                OVERLAY_BYTES.set(self._size)
+                return None
+            return overlay
+
+    def set_rendered(
+        self, token: str, overlay: PendingOverlay, rendered: bytes
+    ) -> None:
+        """Заменяет исходные данные готовым изображением."""
+
+        with self._lock:
+            if self._entries.get(token) is not overlay:
+                return
+            self._size -= overlay.size
+            overlay.rendered = rendered
+            overlay.data = b""
+            overlay.panels = overlay.digits = []
+            self._size += overlay.size
+            OVERLAY_BYTES.set(self._size)
+
+    def _prune(self, now: float) -> None:
+        # Время жизни у всех записей одинаковое: просроченные идут первыми
+        while self._entries:
+            token, overlay = next(iter(self._entries.items()))
+            if overlay.expires_at > now:
+                break
+            self._remove(token)
+
+    def _remove(self, token: str) -> None:
+        overlay = self._entries.pop(token)
+        self._size -= overlay.size
@@ -0,0 +1,110 @@
+import numpy as np
+
+# Доля площади левой рамки, при которой рамки цифр считаются дубликатами
+OVERLAP_THRESHOLD = 0.5
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    """Возвращает площади рамок (N,4) в формате xyxy."""
+
+    widths = np.clip(boxes[:, 2] - boxes[:, 0], 0, None)
+    heights = np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    return widths * heights
+
+
+def intersection_areas(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Возвращает матрицу (N,M) площадей пересечения рамок."""
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    return np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Возвращает матрицу (N,M) IoU рамок."""
+
+    inter = intersection_areas(boxes_a, boxes_b)
+    union = box_areas(boxes_a)[:, None] + box_areas(boxes_b)[None, :] - inter
+    return np.divide(inter, union, out=np.zeros(inter.shape), where=union > 0)
+
+
+def overlap_matrix(boxes: np.ndarray) -> np.ndarray:
+    """Возвращает матрицу (N,N) перекрытий рамок, упорядоченных по x1.
+
+    Как в прежней реализации, перекрытие пары -- площадь пересечения,
+    деленная на площадь левой рамки: элемент (i, j) при i < j делится на
+    площадь i-й рамки. Матрица симметрична, диагональ нулевая.
+    """
+
+    inter = intersection_areas(boxes, boxes)
+    areas = box_areas(boxes)
+    index = np.arange(len(boxes))
+    left = areas[np.minimum(index[:, None], index[None, :])]
+    overlap = np.divide(inter, left, out=np.zeros(inter.shape), where=left > 0)
+    np.fill_diagonal(overlap, 0)
+    return overlap
+
+
+def intersects_box(boxes: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """Возвращает маску (N,) рамок, пересекающихся или соприкасающихся с рамкой."""
+
+    return (
+        (boxes[:, 0] <= box[2])
+        & (boxes[:, 2] >= box[0])
+        & (boxes[:, 1] <= box[3])
+        & (boxes[:, 3] >= box[1])
+    )
+
+
+def assign_boxes(boxes: np.ndarray, containers: np.ndarray) -> np.ndarray:
+    """Сопоставляет каждой рамке контейнер с наибольшей площадью пересечения.
+
+    Рамки, только соприкасающиеся с контейнером, тоже ему назначаются.
+    При равенстве выбирается первый контейнер. Возвращает индексы (N,),
+    -1 -- рамка не пересекается ни с одним контейнером.
+    """
+
+    if len(boxes) == 0 or len(containers) == 0:
+        return np.full(len(boxes), -1, dtype=np.intp)
+
+    touches = (
+        (boxes[:, None, 0] <= containers[None, :, 2])
+        & (boxes[:, None, 2] >= containers[None, :, 0])
+        & (boxes[:, None, 1] <= containers[None, :, 3])
+        & (boxes[:, None, 3] >= containers[None, :, 1])
+    )
+    scores = np.where(touches, intersection_areas(boxes, containers) + 1, 0)
+    return np.where(touches.any(axis=1), scores.argmax(axis=1), -1)
+
+
+def suppress_duplicates(
+    boxes: np.ndarray,
+    conf: np.ndarray,
+    threshold: float = OVERLAP_THRESHOLD,
+    adjacent_only: bool = False,
+) -> np.ndarray:
+    """Удаляет дубликаты цифр, оставляя более уверенные.
+
+    Рамки упорядочиваются по x1, и в каждой паре, перекрытие которой по
+    `overlap_matrix` больше `threshold`, отбрасывается менее уверенная
+    рамка (при равенстве -- левая). Учитываются все пары, в том числе
+    дубликаты, между которыми по x1 попала другая рамка; `adjacent_only`
+    оставляет только соседние пары, как в прежней реализации на
+    pandas/shapely. Возвращает индексы оставшихся рамок, упорядоченные по x1.
+    """
+
+    order = np.argsort(boxes[:, 0], kind="stable")
+    if len(order) < 2:
+        return order
+
+    overlaps = np.triu(overlap_matrix(boxes[order]) > threshold, 1)
+    if adjacent_only:
+        overlaps &= np.eye(len(order), k=1, dtype=bool)
+    left, right = np.nonzero(overlaps)
+    sorted_conf = conf[order]
+    drop = np.where(sorted_conf[right] < sorted_conf[left], right, left)
+    keep = np.ones(len(order), dtype=bool)
+    keep[drop] = False
+    return order[keep]
@@ -1,160 +1,212 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
-import pandas as pd
-from shapely import Polygon
+import torch
 from ultralytics import YOLO
 from ultralytics.engine.results import Results
 
+from src.postprocess import OVERLAP_THRESHOLD, assign_boxes, suppress_duplicates
+from src.preprocess import PreparedInputMixin, attach_prepared_predictor
 
-@dataclass
+# Общие таблицы имен классов: одинаковые словари не копируются в каждый объект
+_NAMES_TABLES: Dict[Tuple[Tuple[int, str], ...], Dict[int, str]] = {}
+
+
+def shared_names(names: Dict[int, str]) -> Dict[int, str]:
+    """Возвращает общий экземпляр таблицы имен классов."""
+
+    return _NAMES_TABLES.setdefault(tuple(names.items()), names)
+
+
+@dataclass(slots=True)
 class DetectedObject:
-    image: str
-    names: Dict[int, str]
-    cls: List[int]
-    conf: List[float]
-    xyxy: List[List[int]]
+    """Детекции одного изображения в непрерывных массивах NumPy.
 
+    `xyxy` -- рамки (N,4) int32, `conf` -- уверенность (N,) float32,
+    `cls` -- классы (N,) uint8. Списки приводятся к массивам при создании.
+    """
 
-def predict(task: str, image: np.ndarray, model_path: Path) -> List[Results]:
-    """Возвращает предсказания модели."""
-    model = YOLO(model_path, task=task)
-    results = model(
-        image,
-        device=0,
-        conf=0.25,
-        save=False,
-        save_txt=False,
-        save_crop=False,
-        exist_ok=True,
-        show_labels=False,
-        show_conf=False,
-    )
+    image: str
+    names: Dict[int, str]
+    cls: np.ndarray
+    conf: np.ndarray
+    xyxy: np.ndarray
+
+    def __post_init__(self) -> None:
+        self.cls = np.asarray(self.cls, dtype=np.uint8).reshape(-1)
+        self.conf = np.asarray(self.conf, dtype=np.float32).reshape(-1)
+        self.xyxy = np.asarray(self.xyxy, dtype=np.int32).reshape(-1, 4)
+
+    def __len__(self) -> int:
+        return len(self.cls)
+
+
+def predict(
+    model: YOLO,
+    image: Union[np.ndarray, List[np.ndarray]],
+    imgsz: int = 640,
+    device: Union[int, str] = 0,
+    conf: float = 0.25,
+    prepared: Optional[torch.Tensor] = None,
+) -> List[Results]:
+    """Возвращает предсказания загруженной модели для изображения или батча.
+
+    `prepared` -- батч `image`, уже подготовленный `prepare_batch`:
+    модель получает его вместо собственного препроцессинга.
+    """
+
+    if prepared is not None:
+        # ultralytics пересоздает предиктор при смене устройства
+        if not isinstance(model.predictor, PreparedInputMixin):
+            attach_prepared_predictor(model, device)
+        model.predictor.prepared = prepared  # type: ignore
+    try:
+        results = model(
+            image,
+            device=device,
+            imgsz=imgsz,
+            conf=conf,
+            save=False,
+            save_txt=False,
+            save_crop=False,
+            exist_ok=True,
+            show_labels=False,
+            show_conf=False,
+        )
+    finally:
+        if isinstance(model.predictor, PreparedInputMixin):
+            model.predictor.prepared = None
     return results
 
 
 def extract_detected_object_from_results(
     results: List[Results],
 ) -> List[DetectedObject]:
-    """Извлекает координаты объектов из результатов предсказания."""
+    """Извлекает координаты объектов из результатов предсказания.
+
+    Результаты ultralytics держат исходное изображение и маски сегментации,
+    поэтому после извлечения список `results` очищается.
+    """
     objects = []
     for result in results:
-        image = Path(result.path).name
-        names = result.names
-        cls = result.boxes.cls.cpu().numpy().astype(int).tolist()  # type: ignore
-        conf = result.boxes.conf.cpu().tolist()  # type: ignore
-        xyxy = result.boxes.xyxy.cpu().numpy().astype(int).tolist()  # type: ignore
-
-        objects.append(DetectedObject(image, names, cls, conf, xyxy))
+        # Одна копия (N,6) с устройства вместо отдельных для каждого поля
+        data = result.boxes.data.cpu().numpy()  # type: ignore
+        objects.append(
+            DetectedObject(
+                Path(result.path).name,
+                shared_names(result.names),
+                data[:, 5].astype(np.uint8),
+                data[:, 4].astype(np.float32),
+                data[:, :4].astype(np.int32),
+            )
+        )
+        result.orig_img = None
+        result.masks = None
+    results.clear()
 
     return objects
 
 
-def is_inside_panel(
-    digit_coords: tuple[int, int, int, int], panel_coords: tuple[int, int, int, int]
-) -> bool:
-    """Проверяет, пересекается ли полигон цифры с полигоном панели."""
-    digit_poly = Polygon(
-        [
-            (digit_coords[0], digit_coords[1]),
-            (digit_coords[2], digit_coords[1]),
-            (digit_coords[2], digit_coords[3]),
-            (digit_coords[0], digit_coords[3]),
-        ]
-    )
-    panel_poly = Polygon(
-        [
-            (panel_coords[0], panel_coords[1]),
-            (panel_coords[2], panel_coords[1]),
-            (panel_coords[2], panel_coords[3]),
-            (panel_coords[0], panel_coords[3]),
-        ]
-    )
-    return digit_poly.intersects(panel_poly)
-
-
-def build_polygon(coords: list[int]) -> Polygon:
-    """Строит полигон по координатам."""
-    poly = Polygon(
-        [
-            (coords[0], coords[1]),
-            (coords[2], coords[1]),
-            (coords[2], coords[3]),
-            (coords[0], coords[3]),
-        ]
-    )
-    return poly
+def crop_panel(
+    image: np.ndarray, panel_coords: np.ndarray, padding: float
+) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Вырезает панель с отступом и возвращает вырезку и ее смещение в изображении."""
+
+    x1, y1, x2, y2 = map(int, panel_coords)
+    pad_x = int((x2 - x1) * padding)
+    pad_y = int((y2 - y1) * padding)
+    height, width = image.shape[:2]
+    x1, y1 = max(x1 - pad_x, 0), max(y1 - pad_y, 0)
+    x2, y2 = min(x2 + pad_x, width), min(y2 + pad_y, height)
+    return np.ascontiguousarray(image[y1:y2, x1:x2]), (x1, y1)
 
 
-def filter_duplicates_by_confidence(df: pd.DataFrame) -> pd.DataFrame:
-    """Удаляет дубликаты на основе x1 координат и уверенности."""
+def shift_detected_object(obj: DetectedObject, dx: int, dy: int) -> DetectedObject:
+    """Переносит координаты объектов из системы вырезки в систему изображения."""
 
-    df.sort_values(by="x1", inplace=True, ignore_index=True)
+    obj.xyxy = obj.xyxy + np.array([dx, dy, dx, dy], dtype=np.int32)
+    return obj
 
-    idx_for_drop = []
-    for i in range(1, len(df)):
-        poly1 = build_polygon(df.iloc[i - 1]["xyxy"])
-        poly2 = build_polygon(df.iloc[i]["xyxy"])
-        intersection = poly1.intersection(poly2)
-        overlap = intersection.area / poly1.area
 
-        if overlap > 0.5:
-            df_2rows = df.iloc[i - 1 : i + 1]
-            min_conf_index = df_2rows["conf"].idxmin()
-            idx_for_drop.append(min_conf_index)
+def scale_detected_object(obj: DetectedObject, factor: float) -> DetectedObject:
+    """Возвращает копию объектов с масштабированными координатами, например
+    для исходного разрешения. Исходный объект (в том числе из кэша) не меняется.
+    """
 
-    df.drop(idx_for_drop, inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    return df
+    return replace(obj, xyxy=np.rint(obj.xyxy * factor).astype(np.int32))
 
 
 def process_digits_results(
-    panels: List[DetectedObject], digits: List[DetectedObject]
+    panels: List[DetectedObject],
+    digits: List[DetectedObject],
+    overlap_threshold: float = OVERLAP_THRESHOLD,
 ) -> List[DetectedObject]:
     """Удаляет дубликаты классов цифр, выбирая наиболее вероятные, которые пересекаются с панелями."""
 
     new_digits = []
-    panel_coords = panels[0].xyxy[0]
-
-    for pred_dig in digits:
-        # Преобразование в DataFrame
-        digits_df = pd.DataFrame(
-            {"cls": pred_dig.cls, "conf": pred_dig.conf, "xyxy": pred_dig.xyxy}
-        )
-        digits_df[["x1", "y1", "x2", "y2"]] = pd.DataFrame(
-            digits_df["xyxy"].tolist(), index=digits_df.index
-        )
 
+    for pred_panels, pred_dig in zip(panels, digits):
         # Удаление дубликатов
-        digits_df = filter_duplicates_by_confidence(digits_df)
+        keep = suppress_duplicates(pred_dig.xyxy, pred_dig.conf, overlap_threshold)
 
-        # Проверка, пересекаются ли цифры с панелью
-        digits_df["inside_panel"] = digits_df.apply(
-            lambda row: is_inside_panel(
-                (row["x1"], row["y1"], row["x2"], row["y2"]), panel_coords  # type: ignore
-            ),
-            axis=1,
-        )  # type: ignore
-
-        # Фильтрация по нахождению внутри панели
-        filtered_df = digits_df[digits_df["inside_panel"]].copy()
+        # Фильтрация по пересечению хотя бы с одной панелью
+        keep = keep[assign_boxes(pred_dig.xyxy[keep], pred_panels.xyxy) >= 0]
 
         # Обновление результатов
-        pred_dig.cls = filtered_df["cls"].tolist()
-        pred_dig.conf = filtered_df["conf"].tolist()
-        pred_dig.xyxy = filtered_df["xyxy"].tolist()
+        pred_dig.cls = pred_dig.cls[keep]
+        pred_dig.conf = pred_dig.conf[keep]
+        pred_dig.xyxy = pred_dig.xyxy[keep]
 
         new_digits.append(pred_dig)
 
     return new_digits
 
 
+def select_objects(obj: DetectedObject, indices: Iterable[int]) -> DetectedObject:
+    """Возвращает объект только с выбранными детекциями."""
+
+    index = np.fromiter(indices, dtype=np.intp)
+    return DetectedObject(
+        obj.image, obj.names, obj.cls[index], obj.conf[index], obj.xyxy[index]
+    )
+
+
+def concat_objects(
+    image: str, names: Dict[int, str], objects: List[DetectedObject]
+) -> DetectedObject:
+    """Объединяет детекции нескольких объектов одного изображения."""
+
+    if not objects:
+        return DetectedObject(image, names, [], [], [])
+    return DetectedObject(
+        image,
+        names,
+        np.concatenate([obj.cls for obj in objects]),
+        np.concatenate([obj.conf for obj in objects]),
+        np.concatenate([obj.xyxy for obj in objects]),
+    )
+
+
+def group_digits_by_panel(
+    panels: DetectedObject, digits: DetectedObject
+) -> List[DetectedObject]:
+    """Распределяет цифры по панелям за один векторный проход.
+
+    Каждая цифра достается панели, с которой пересекается сильнее всего.
+    Возвращает по объекту с цифрами на каждую панель в порядке `panels`.
+    """
+
+    assignment = assign_boxes(digits.xyxy, panels.xyxy)
+    return [
+        select_objects(digits, np.flatnonzero(assignment == i))
+        for i in range(len(panels))
+    ]
+
+
 def extract_value(pred: DetectedObject) -> str:
     """Извлекает значение показаний счетчика из предсказания."""
-    sorted_digits = sorted(
-        zip(pred.cls, [coord[0] for coord in pred.xyxy]), key=lambda x: x[1]
-    )
-    value = "".join(str(val[0]) for val in sorted_digits)
+    order = np.argsort(pred.xyxy[:, 0], kind="stable")
+    value = "".join(map(str, pred.cls[order].tolist()))
     return value
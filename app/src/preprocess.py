@@ -0,0 +1,117 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+from ultralytics.models.yolo.detect import DetectionPredictor
+from ultralytics.models.yolo.segment import SegmentationPredictor
+
+# Наибольший шаг сетки моделей YOLOv8 и цвет полей, как в LetterBox ultralytics
+STRIDE = 32
+PAD_VALUE = 114
+
+
+def batch_shape(
+    shapes: List[Tuple[int, int]], imgsz: int, rect: bool
+) -> Tuple[int, int]:
+    """Размер входа моделей для батча.
+
+    Как в ultralytics: для изображений одного размера -- минимальный
+    прямоугольник, кратный шагу сетки (только для моделей PyTorch),
+    иначе квадрат `imgsz`.
+    """
+
+    if not rect or len(set(shapes)) != 1:
+        return imgsz, imgsz
+    height, width = shapes[0]
+    r = min(imgsz / height, imgsz / width)
+    new_w, new_h = round(width * r), round(height * r)
+    return new_h + (imgsz - new_h) % STRIDE, new_w + (imgsz - new_w) % STRIDE
+
+
+def prepare_batch(
+    imgs: List[np.ndarray],
+    imgsz: int = 640,
+    rect: bool = True,
+    device: Union[int, str] = "cpu",
+) -> torch.Tensor:
+    """Уменьшает, дополняет полями и нормализует батч один раз для всех моделей.
+
+    Возвращает тензор (B,3,H,W) float 0..1. Изображения пишутся сразу в
+    общий буфер батча, на устройство передается uint8, а параметры letterbox,
+    порядок каналов и нормализация повторяют препроцессинг ultralytics,
+    поэтому результаты моделей не меняются.
+    """
+
+    shapes = [img.shape[:2] for img in imgs]
+    out_h, out_w = batch_shape(shapes, imgsz, rect)
+    batch = np.full((len(imgs), out_h, out_w, 3), PAD_VALUE, dtype=np.uint8)
+    for i, (img, (height, width)) in enumerate(zip(imgs, shapes)):
+        r = min(out_h / height, out_w / width)
+        new_w, new_h = round(width * r), round(height * r)
+        left = round((out_w - new_w) / 2 - 0.1)
+        top = round((out_h - new_h) / 2 - 0.1)
+        if (new_h, new_w) != (height, width):
+            img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        batch[i, top : top + new_h, left : left + new_w] = img
+
+    tensor = torch.from_numpy(batch)
+    if device != "cpu":
+        tensor = tensor.to(f"cuda:{device}" if isinstance(device, int) else device)
+    # ultralytics считает массивы NumPy изображениями BGR и меняет порядок каналов
+    return tensor.permute(0, 3, 1, 2).flip(1).contiguous().float().div_(255)
+
+
+class PreparedInputMixin:
+    """Предиктор ultralytics, который берет готовый тензор `prepared` вместо
+    своего препроцессинга.
+
+    Источником по-прежнему служат исходные кадры: по их размерам ultralytics
+    переносит рамки и маски из входа модели обратно без копирования тензора
+    в изображения.
+    """
+
+    prepared: Optional[torch.Tensor] = None
+
+    def preprocess(self, im: Any) -> torch.Tensor:
+        prepared, self.prepared = self.prepared, None
+        return super().preprocess(im if prepared is None else prepared)  # type: ignore
+
+
+class PreparedDetectionPredictor(PreparedInputMixin, DetectionPredictor):
+    pass
+
+
+class PreparedSegmentationPredictor(PreparedInputMixin, SegmentationPredictor):
+    pass
+
+
+PREPARED_PREDICTORS: Dict[str, type] = {
+    "detect": PreparedDetectionPredictor,
+    "segment": PreparedSegmentationPredictor,
+}
+
+
+def attach_prepared_predictor(model: YOLO, device: Union[int, str]) -> None:
+    """Устанавливает модели предиктор, принимающий готовый тензор.
+
+    Предиктор создается так же, как при первом вызове модели: аргумент
+    `predictor` в ultralytics 8.2 ожидает экземпляр, а в новых версиях --
+    класс, но уже установленный предиктор переиспользуют все версии.
+    """
+
+    args = {
+        **model.overrides,
+        "conf": 0.25,
+        "batch": 1,
+        "save": False,
+        "mode": "predict",
+        "rect": True,
+        "device": device,
+    }
+    predictor = PREPARED_PREDICTORS[model.task](
+        overrides=args, _callbacks=model.callbacks
+    )
+    predictor.setup_model(model=model.model, verbose=False)
+    model.predictor = predictor
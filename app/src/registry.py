@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+from ultralytics import YOLO
+
+from src.backends import Backend, backend_device, exported_model_path, resolve_backend
+from src.config import ModelsConfig, models_config
+from src.metrics import gauge
+from src.predict import predict
+from src.preprocess import attach_prepared_predictor
+
+logger = logging.getLogger(__name__)
+
+MODEL_LOAD_SECONDS = gauge(
+    "model_load_seconds", "Time spent loading and warming up models.", ("model",)
+)
+
+
+class ModelRegistry:
+    """Хранит загруженные и прогретые модели панелей и цифр."""
+
+    def __init__(self, config: ModelsConfig) -> None:
+        self.config = config
+        self.panels: Optional[YOLO] = None
+        self.digits: Optional[YOLO] = None
+        self.backend: Optional[Backend] = None
+        self.device: Union[int, str] = "cpu"
+        # Модели ultralytics не рассчитаны на одновременные вызовы из разных потоков
+        self.panels_lock = threading.Lock()
+        self.digits_lock = threading.Lock()
+        self.load_times: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.ready = False
+
+    def load(self) -> None:
+        """Загружает модели и прогревает их на пустом кадре."""
+
+        self.ready = False
+        self.error = None
+        try:
+            self.backend = resolve_backend(self.config.backend)
+            self.device = backend_device(self.backend)
+            self.panels = self._load_model("panels", self.config.panels_path, "segment")
+            self.digits = self._load_model("digits", self.config.digits_path, "detect")
+            self.warmup()
+        except Exception as e:
+            self.error = str(e)
+            logger.exception("Failed to load models")
+            raise
+        self.ready = True
+
+    def _load_model(self, name: str, model_path: Path, task: str) -> YOLO:
+        """Загружает одну модель выбранного бэкенда и запоминает время загрузки."""
+
+        start = time.perf_counter()
+        path = exported_model_path(model_path, self.backend, self.config.int8)  # type: ignore
+        model = YOLO(path, task=task)
+        attach_prepared_predictor(model, self.device)
+        self.load_times[name] = time.perf_counter() - start
+        MODEL_LOAD_SECONDS.set(self.load_times[name], model=name)
+        logger.info(
+            "Model %s (%s) loaded in %.3f s", path, self.backend, self.load_times[name]
+        )
+        return model
+
+    def warmup(self) -> None:
+        """Прогоняет пустой кадр через обе модели."""
+
+        size = self.config.warmup_size
+        frame = np.zeros((size, size, 3), dtype=np.uint8)
+        start = time.perf_counter()
+        predict(self.panels, frame, device=self.device)  # type: ignore
+        predict(self.digits, frame, device=self.device)  # type: ignore
+        self.load_times["warmup"] = time.perf_counter() - start
+        MODEL_LOAD_SECONDS.set(self.load_times["warmup"], model="warmup")
+
+    def unload(self) -> None:
+        """Освобождает модели."""
+
+        self.ready = False
+        self.panels = None
+        self.digits = None
+
+
+registry = ModelRegistry(models_config)
+
+
+def load_worker_registry() -> Dict[str, float]:
+    """Загружает модели в дочернем процессе пула инференса."""
+
+    registry.load()
+    return registry.load_times
+
+
+def worker_load_times() -> Dict[str, float]:
+    """Возвращает время загрузки моделей исполнителя пула."""
+
+    return registry.load_times
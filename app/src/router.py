@@ -1,33 +1,207 @@
+import asyncio
+import base64
 import io
-from pathlib import Path
-from typing import Dict, List, Tuple
+import json
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
 
 import numpy as np
-from fastapi import APIRouter, File, UploadFile
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
-from PIL import Image
 
+from src.backends import Backend
+from src.batching import MicroBatcher, QueueFullError
+from src.bulk import iter_upload_images
+from src.cache import ResultCache, content_key, perceptual_key, results_fingerprint
+from src.config import (
+    batching_config,
+    cache_config,
+    decode_config,
+    models_config,
+    overlay_config,
+    pipeline_config,
+)
+from src.decode import DecodedImage, decode_image, probe_scale
+from src.metrics import counter, timed
+from src.overlays import OVERLAY_REQUESTS, OverlayStore, PendingOverlay
 from src.predict import (
     DetectedObject,
+    concat_objects,
+    crop_panel,
     extract_detected_object_from_results,
     extract_value,
+    group_digits_by_panel,
     predict,
     process_digits_results,
+    scale_detected_object,
+    shared_names,
+    shift_detected_object,
+)
+from src.preprocess import prepare_batch
+from src.registry import registry
+from src.workers import worker_count
+from src.visualize import MEDIA_TYPES, encode_image, visualize
+
+DETECTIONS = counter(
+    "pipeline_detections_total", "Objects detected by the models.", ("kind",)
+)
+EMPTY_PANELS = counter(
+    "pipeline_empty_panels_total", "Images where no meter panel was found."
 )
-from src.visualize import visualize
 
-# Конфигурация моделей
-MODEL_PANELS = Path("models/panels_base.pt")
-MODEL_DIGITS = Path("models/digits_base.pt")
 
-router = APIRouter(prefix="/image", tags=["Predict & Visualize"])
+def require_ready() -> None:
+    """Отклоняет запрос, пока модели не загружены и не прогреты."""
+
+    if not batcher.status().ready:
+        raise HTTPException(status_code=503, detail="Models are not ready")
+
+
+router = APIRouter(
+    prefix="/image",
+    tags=["Predict & Visualize"],
+    dependencies=[Depends(require_ready)],
+)
 
 
 def image_to_array(image: UploadFile) -> np.ndarray:
     """Конвертирует загруженное изображение в массив NumPy."""
 
-    img = Image.open(image.file)
-    return np.array(img)
+    return decode_image(image.file, decode_config.target_size).array
+
+
+def bytes_to_image(data: bytes) -> DecodedImage:
+    """Декодирует байты изображения для инференса вместе с масштабом кадра."""
+
+    with timed("decode"):
+        return decode_image(io.BytesIO(data), decode_config.target_size)
+
+
+def bytes_to_array(data: bytes) -> np.ndarray:
+    """Декодирует байты изображения в массив NumPy для инференса."""
+
+    return bytes_to_image(data).array
+
+
+def frame_scale(data: bytes) -> float:
+    """Масштаб кадра для инференса относительно исходного фото, без декодирования."""
+
+    return probe_scale(io.BytesIO(data), decode_config.target_size)
+
+
+def detect_digits_on_panels(
+    imgs: List[np.ndarray],
+    panels_batch: List[DetectedObject],
+    conf: Optional[float] = None,
+) -> List[DetectedObject]:
+    """Ищет цифры только на вырезках найденных панелей.
+
+    Вырезки всех панелей всех изображений идут в модель одним батчем.
+    Для изображений без панели модель цифр не запускается.
+    """
+
+    crops, offsets, indices = [], [], []
+    for i, (img, panel) in enumerate(zip(imgs, panels_batch)):
+        for panel_coords in panel.xyxy:
+            crop, offset = crop_panel(img, panel_coords, pipeline_config.panel_padding)
+            crops.append(crop)
+            offsets.append(offset)
+            indices.append(i)
+
+    names = shared_names(registry.digits.names)  # type: ignore
+    if not crops:
+        return [concat_objects(panel.image, names, []) for panel in panels_batch]
+
+    with registry.digits_lock:
+        digits_results = predict(
+            registry.digits,  # type: ignore
+            crops,
+            imgsz=pipeline_config.digits_img_size,
+            device=registry.device,
+            conf=pipeline_config.conf if conf is None else conf,
+        )
+    # Цифры с вырезок разных панелей одного изображения объединяются
+    per_image: List[List[DetectedObject]] = [[] for _ in panels_batch]
+    for i, (dx, dy), digits in zip(
+        indices, offsets, extract_detected_object_from_results(digits_results)
+    ):
+        per_image[i].append(shift_detected_object(digits, dx, dy))
+
+    return [
+        concat_objects(panel.image, names, objects)
+        for panel, objects in zip(panels_batch, per_image)
+    ]
+
+
+def get_predictions_batch(
+    imgs: List[np.ndarray],
+) -> List[Tuple[List[DetectedObject], List[DetectedObject]]]:
+    """Получает предсказания по панелям и показаниям для батча изображений.
+
+    Кадры уменьшаются и нормализуются один раз, и обе модели получают
+    общий тензор; каскад подает модели цифр вырезки панелей отдельно.
+    """
+
+    prepared = None
+    if pipeline_config.shared_preprocess:
+        with timed("preprocess"):
+            prepared = prepare_batch(
+                imgs,
+                imgsz=pipeline_config.img_size,
+                # Прямоугольный вход допускают только модели PyTorch, как в ultralytics
+                rect=registry.backend in (Backend.TORCH_CUDA, Backend.TORCH_CPU),
+                device=registry.device,
+            )
+
+    # Найти панели показаний на изображениях счетчиков
+    with timed("panels"), registry.panels_lock:
+        panels_results = predict(
+            registry.panels,  # type: ignore
+            imgs,
+            imgsz=pipeline_config.img_size,
+            device=registry.device,
+            conf=pipeline_config.conf,
+            prepared=prepared,
+        )
+        panels_batch = extract_detected_object_from_results(panels_results)
+
+    # Определить показания
+    with timed("digits"):
+        if pipeline_config.cascade:
+            digits_batch = detect_digits_on_panels(imgs, panels_batch)
+        else:
+            with registry.digits_lock:
+                digits_results = predict(
+                    registry.digits,  # type: ignore
+                    imgs,
+                    imgsz=pipeline_config.img_size,
+                    device=registry.device,
+                    conf=pipeline_config.conf,
+                    prepared=prepared,
+                )
+            digits_batch = extract_detected_object_from_results(digits_results)
+
+    predictions = []
+    with timed("postprocess"):
+        for panel, digit in zip(panels_batch, digits_batch):
+            panels, digits = [panel], [digit]
+            # Если есть результаты, обработать их
+            if len(digits[0]):
+                digits = process_digits_results(
+                    panels, digits, pipeline_config.overlap_threshold
+                )
+            predictions.append((panels, digits))
+
+    return predictions
 
 
 def get_predictions(
@@ -35,43 +209,344 @@ def get_predictions(
 ) -> Tuple[List[DetectedObject], List[DetectedObject]]:
     """Получает предсказания по панели и показаниям счетчиков."""
 
-    # Найти панели показаний на изображениях счетчиков
-    panels_results = predict("segment", img, MODEL_PANELS)
-    panels = extract_detected_object_from_results(panels_results)
+    return get_predictions_batch([img])[0]
+
+
+# Объединяет одновременные запросы в батчи перед вызовом моделей
+batcher: MicroBatcher[np.ndarray, Tuple[List[DetectedObject], List[DetectedObject]]] = (
+    MicroBatcher(get_predictions_batch, batching_config)
+)
+
+
+# Кэш результатов для повторно загружаемых изображений
+result_cache = ResultCache(
+    cache_config,
+    lambda: results_fingerprint(models_config, pipeline_config, decode_config),
+)
+
+# Изображения с разметкой, которые /image/analyze отдает по ссылке
+overlay_store = OverlayStore(overlay_config)
 
-    # Определить показания
-    digits_results = predict("detect", img, MODEL_DIGITS)
-    digits = extract_detected_object_from_results(digits_results)
 
-    # Если есть результаты, обработать их
-    if digits[0].cls:
-        digits = process_digits_results(panels, digits)
+async def infer(
+    img: np.ndarray, wait: bool = False
+) -> Tuple[List[DetectedObject], List[DetectedObject]]:
+    """Отправляет изображение в очередь инференса, при перегрузке отвечает 503."""
+
+    try:
+        return await batcher.submit(img, wait=wait)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Inference queue is full",
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
+
+
+def count_detections(
+    predictions: Tuple[List[DetectedObject], List[DetectedObject]],
+) -> None:
+    """Учитывает найденные панели и цифры в счетчиках метрик."""
+
+    panels, digits = predictions
+    DETECTIONS.inc(sum(len(obj) for obj in panels), kind="panels")
+    DETECTIONS.inc(sum(len(obj) for obj in digits), kind="digits")
+    if not any(len(obj) for obj in panels):
+        EMPTY_PANELS.inc()
+
+
+async def predict_bytes(
+    data: bytes, need_image: bool = False, wait: bool = False
+) -> Tuple[
+    Optional[np.ndarray], float, Tuple[List[DetectedObject], List[DetectedObject]]
+]:
+    """Возвращает предсказания для загруженных байтов, используя кэш результатов.
+
+    Изображение декодируется, только если результата нет в кэше или
+    оно нужно для визуализации. Координаты предсказаний -- в пикселях
+    декодированного кадра, его масштаб относительно исходного фото
+    возвращается вторым элементом.
+    """
+
+    keys = [content_key(data)]
+    with timed("cache"):
+        predictions = await run_in_threadpool(result_cache.get, keys[0])
+    if predictions is not None and not need_image:
+        return None, await run_in_threadpool(frame_scale, data), predictions
+
+    decoded = await run_in_threadpool(bytes_to_image, data)
+    img = decoded.array
+    if predictions is not None:
+        return img, decoded.scale, predictions
+
+    if cache_config.perceptual:
+        keys.append(perceptual_key(img))
+        predictions = await run_in_threadpool(result_cache.get, keys[1])
+        if predictions is not None:
+            await run_in_threadpool(result_cache.put, keys[:1], predictions)
+            return img, decoded.scale, predictions
 
-    return panels, digits
+    predictions = await infer(img, wait=wait)
+    count_detections(predictions)
+    await run_in_threadpool(result_cache.put, keys, predictions)
+    return img, decoded.scale, predictions
 
 
-def get_visualized_image(img: np.ndarray) -> io.BytesIO:
+def get_visualized_image(
+    img: np.ndarray,
+    panels: List[DetectedObject],
+    digits: List[DetectedObject],
+    image_format: str = "jpeg",
+    quality: int = 75,
+    max_size: Optional[int] = None,
+) -> io.BytesIO:
     """Возвращает визуализированное изображение как поток байтов."""
 
-    panels, digits = get_predictions(img)
     # Визуализация результатов работы модели
-    img_pred = visualize(img, panels, digits)
-    img_bytes = io.BytesIO()
-    Image.fromarray(img_pred).save(img_bytes, format="JPEG")
-    img_bytes.seek(0)
+    with timed("render"):
+        img_pred = visualize(img, panels, digits)
+    with timed("encode"):
+        img_bytes = io.BytesIO(encode_image(img_pred, image_format, quality, max_size))
     return img_bytes
 
 
+def decode_full_resolution(
+    data: bytes, panels: List[DetectedObject], digits: List[DetectedObject]
+) -> Tuple[np.ndarray, List[DetectedObject], List[DetectedObject]]:
+    """Декодирует исходное изображение и возвращает копии объектов в его координатах."""
+
+    factor = 1 / frame_scale(data)
+    return (
+        decode_image(io.BytesIO(data)).array,
+        [scale_detected_object(obj, factor) for obj in panels],
+        [scale_detected_object(obj, factor) for obj in digits],
+    )
+
+
+def render_overlay(
+    data: bytes,
+    img: Optional[np.ndarray],
+    panels: List[DetectedObject],
+    digits: List[DetectedObject],
+    image_format: str,
+    quality: int,
+    max_size: Optional[int],
+    full_resolution: bool,
+) -> io.BytesIO:
+    """Рисует разметку по готовым детекциям, декодируя фото при необходимости."""
+
+    if full_resolution:
+        img, panels, digits = decode_full_resolution(data, panels, digits)
+    elif img is None:
+        img = bytes_to_array(data)
+    return get_visualized_image(img, panels, digits, image_format, quality, max_size)
+
+
 @router.post("/visualize")
-async def visualize_results(image: UploadFile = File(...)) -> StreamingResponse:
-    img = image_to_array(image)
-    img_bytes = get_visualized_image(img)
-    return StreamingResponse(img_bytes, media_type="image/jpeg")
+async def visualize_results(
+    image: UploadFile = File(...),
+    full_resolution: bool = False,
+    max_size: Optional[int] = Query(None, gt=0),
+    quality: int = Query(75, ge=1, le=100),
+    image_format: Literal["jpeg", "webp"] = Query("jpeg", alias="format"),
+) -> StreamingResponse:
+    data = await image.read()
+    img, _, (panels, digits) = await predict_bytes(data, need_image=not full_resolution)
+    img_bytes = await run_in_threadpool(
+        render_overlay,
+        data,
+        img,
+        panels,
+        digits,
+        image_format,
+        quality,
+        max_size,
+        full_resolution,
+    )
+    return StreamingResponse(img_bytes, media_type=MEDIA_TYPES[image_format])
+
+
+def format_reading(digits: DetectedObject) -> Dict[str, Any]:
+    """Формирует показания, уверенность и рамку каждой цифры слева направо."""
+
+    order = np.argsort(digits.xyxy[:, 0], kind="stable")
+    return {
+        "value": extract_value(digits),
+        "digits": [
+            {"cls": cls, "conf": round(conf, 4), "xyxy": xyxy}
+            for cls, conf, xyxy in zip(
+                digits.cls[order].tolist(),
+                digits.conf[order].tolist(),
+                digits.xyxy[order].tolist(),
+            )
+        ],
+    }
+
+
+def format_readings(
+    panels: DetectedObject, digits: DetectedObject, scale: float = 1.0
+) -> Dict[str, Any]:
+    """Формирует показания всех счетчиков на фото.
+
+    `meters` -- показания каждой панели слева направо. `value` и `digits`
+    верхнего уровня относятся к самой уверенной панели (для совместимости
+    с клиентами, ожидающими один счетчик). `scale` -- масштаб кадра, на
+    котором получены детекции: рамки ответа переводятся в пиксели
+    исходного фото.
+    """
+
+    if scale != 1.0:
+        panels = scale_detected_object(panels, 1 / scale)
+        digits = scale_detected_object(digits, 1 / scale)
+    groups = group_digits_by_panel(panels, digits)
+    meters = [
+        {
+            "panel": {
+                "xyxy": panels.xyxy[i].tolist(),
+                "conf": round(float(panels.conf[i]), 4),
+            },
+            **format_reading(group),
+        }
+        for i, group in enumerate(groups)
+    ]
+    top = format_reading(groups[0] if groups else digits)
+    meters.sort(key=lambda meter: meter["panel"]["xyxy"][0])
+    return {**top, "meters": meters}
 
 
 @router.post("/readings")
-async def read_results(image: UploadFile = File(...)) -> Dict[str, str]:
-    img = image_to_array(image)
-    _, digits = get_predictions(img)
-    value = extract_value(digits[0])
-    return {"value": f"{value}"}
+async def read_results(image: UploadFile = File(...)) -> Dict[str, Any]:
+    _, scale, (panels, digits) = await predict_bytes(await image.read())
+    return format_readings(panels[0], digits[0], scale)
+
+
+@router.post("/analyze")
+async def analyze_results(
+    request: Request,
+    image: UploadFile = File(...),
+    overlay: Literal["none", "inline", "url"] = "none",
+    full_resolution: bool = False,
+    max_size: Optional[int] = Query(None, gt=0),
+    quality: int = Query(75, ge=1, le=100),
+    image_format: Literal["jpeg", "webp"] = Query("jpeg", alias="format"),
+) -> Dict[str, Any]:
+    """Возвращает показания с рамками и, по запросу, разметку за один прогон моделей.
+
+    `overlay=inline` добавляет изображение с разметкой в base64,
+    `overlay=url` -- короткоживущую ссылку, по которой изображение
+    отрисовывается при первом обращении.
+    """
+
+    data = await image.read()
+    need_image = overlay == "inline" and not full_resolution
+    img, scale, (panels, digits) = await predict_bytes(data, need_image=need_image)
+    response = format_readings(panels[0], digits[0], scale)
+    if overlay == "none":
+        return response
+
+    OVERLAY_REQUESTS.inc(mode=overlay)
+    options = (image_format, quality, max_size, full_resolution)
+    if overlay == "inline":
+        img_bytes = await run_in_threadpool(
+            render_overlay, data, img, panels, digits, *options
+        )
+        response["overlay"] = {
+            "media_type": MEDIA_TYPES[image_format],
+            "data": base64.b64encode(img_bytes.getvalue()).decode("ascii"),
+        }
+    else:
+        token, ttl_s = overlay_store.put(PendingOverlay(data, panels, digits, *options))
+        response["overlay_url"] = request.app.url_path_for("get_overlay", token=token)
+        response["overlay_expires_in"] = ttl_s
+    return response
+
+
+@router.get("/overlays/{token}", name="get_overlay")
+async def get_overlay(token: str) -> Response:
+    """Отдает изображение с разметкой по ссылке из /image/analyze."""
+
+    pending = overlay_store.get(token)
+    if pending is None:
+        raise HTTPException(status_code=404, detail="Overlay not found or expired")
+    rendered = pending.rendered
+    if rendered is None:
+        img_bytes = await run_in_threadpool(
+            render_overlay,
+            pending.data,
+            None,
+            pending.panels,
+            pending.digits,
+            pending.image_format,
+            pending.quality,
+            pending.max_size,
+            pending.full_resolution,
+        )
+        rendered = img_bytes.getvalue()
+        overlay_store.set_rendered(token, pending, rendered)
+    return Response(
+        rendered,
+        media_type=MEDIA_TYPES[pending.image_format],
+        headers={"Cache-Control": "private, max-age=60"},
+    )
+
+
+async def read_one(name: str, data: bytes) -> Dict[str, Any]:
+    """Распознает одно изображение пакета; ошибка не прерывает весь пакет."""
+
+    try:
+        # Пакетные запросы ждут места в очереди, а не получают отказ
+        _, scale, (panels, digits) = await predict_bytes(data, wait=True)
+        return {"filename": name, **format_readings(panels[0], digits[0], scale)}
+    except Exception as e:
+        return {"filename": name, "error": f"{type(e).__name__}: {e}"}
+
+
+async def stream_readings(files: List[UploadFile]) -> AsyncIterator[str]:
+    """Отдает по строке JSON на каждое изображение по мере готовности."""
+
+    workers = worker_count(batching_config.workers, batching_config.worker_threads)
+    max_in_flight = batching_config.max_batch_size * workers * 2
+    images = iter_upload_images(files)
+    in_flight: set = set()
+    exhausted = False
+
+    try:
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < max_in_flight:
+                item: Optional[Tuple[str, Union[bytes, Exception]]] = (
+                    await run_in_threadpool(next, images, None)
+                )
+                if item is None:
+                    exhausted = True
+                    break
+                name, data = item
+                if isinstance(data, Exception):
+                    # Поврежденный архив: сообщаем об ошибке и читаем следующие файлы
+                    error = {
+                        "filename": name,
+                        "error": f"{type(data).__name__}: {data}",
+                    }
+                    yield json.dumps(error, ensure_ascii=False) + "\n"
+                    continue
+                in_flight.add(asyncio.ensure_future(read_one(name, data)))
+
+            if not in_flight:
+                break
+            done, in_flight = await asyncio.wait(
+                in_flight, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield json.dumps(task.result(), ensure_ascii=False) + "\n"
+    finally:
+        # Клиент отключился: запросы, которые никто не прочитает, не занимают пул
+        for task in in_flight:
+            task.cancel()
+
+
+@router.post("/readings/batch")
+async def read_results_batch(
+    files: List[UploadFile] = File(...),
+) -> StreamingResponse:
+    """Принимает много изображений или архивы zip/tar, отвечает потоком NDJSON."""
+
+    return StreamingResponse(stream_readings(files), media_type="application/x-ndjson")
@@ -0,0 +1,262 @@
+import asyncio
+import itertools
+import shutil
+import tempfile
+from collections import Counter, defaultdict
+from contextlib import closing
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from PIL import UnidentifiedImageError
+
+from src.config import VideoConfig, batching_config, pipeline_config, video_config
+from src.metrics import counter, timed
+from src.predict import (
+    DetectedObject,
+    extract_detected_object_from_results,
+    extract_value,
+    predict,
+    process_digits_results,
+    select_objects,
+)
+from src.registry import registry
+from src.router import batcher, bytes_to_array, detect_digits_on_panels, require_ready
+
+VIDEO_REJECTED = counter(
+    "video_rejected_total", "Video requests rejected because the limit was reached."
+)
+
+# Видео распознаются частями в общем пуле инференса, но их число ограничено
+video_slots = asyncio.Semaphore(video_config.max_concurrent)
+
+
+@dataclass
+class FrameReading:
+    frame: int
+    keyframe: bool
+    value: str
+    conf: List[float]
+
+
+@dataclass
+class SequenceReading:
+    value: str
+    confidence: float
+    frames_total: int
+    frames_read: int
+    frames: List[FrameReading] = field(default_factory=list)
+
+
+def iter_video_frames(path: Path, config: VideoConfig) -> Iterator[np.ndarray]:
+    """Читает кадры видео в RGB с заданной частотой выборки."""
+
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise ValueError("Unable to open video")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        step = max(1, round(fps / config.sample_fps)) if config.sample_fps else 1
+        index = sampled = 0
+        while sampled < config.max_frames:
+            ok = capture.grab()
+            if not ok:
+                break
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                sampled += 1
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            index += 1
+    finally:
+        capture.release()
+
+
+def detect_panel(frame: np.ndarray) -> DetectedObject:
+    """Находит панель показаний на ключевом кадре.
+
+    В видео снимают один счетчик, поэтому остается только самая уверенная панель.
+    """
+
+    with timed("panels"), registry.panels_lock:
+        results = predict(
+            registry.panels,  # type: ignore
+            frame,
+            imgsz=pipeline_config.img_size,
+            device=registry.device,
+            conf=pipeline_config.conf,
+        )
+        panels = extract_detected_object_from_results(results)[0]
+    return select_objects(panels, range(min(len(panels), 1)))
+
+
+def read_chunk(frames: List[np.ndarray]) -> List[DetectedObject]:
+    """Распознает цифры на части кадров; выполняется в пуле инференса.
+
+    Панель ищется только на первом (ключевом) кадре, на остальных
+    переиспользуется ее положение. Без панели возвращает пустой список.
+    """
+
+    panel = detect_panel(frames[0])
+    if not len(panel):
+        return []
+    with timed("digits"):
+        digits_batch = detect_digits_on_panels(frames, [panel] * len(frames))
+    with timed("postprocess"):
+        return [
+            (
+                process_digits_results(
+                    [panel], [digits], pipeline_config.overlap_threshold
+                )[0]
+                if len(digits)
+                else digits
+            )
+            for digits in digits_batch
+        ]
+
+
+def ordered_confidences(digits: DetectedObject) -> List[float]:
+    """Возвращает уверенность по цифрам слева направо."""
+
+    order = np.argsort(digits.xyxy[:, 0], kind="stable")
+    return digits.conf[order].tolist()
+
+
+def consensus(readings: List[FrameReading]) -> tuple[str, float]:
+    """Объединяет показания кадров в одно голосованием по позициям цифр.
+
+    Голосуют кадры с самой частой длиной показаний, голос каждой цифры
+    взвешен ее уверенностью. Итоговая уверенность -- доля голосов за
+    победившие цифры, умноженная на долю кадров с этой длиной.
+    """
+
+    readings = [reading for reading in readings if reading.value]
+    if not readings:
+        return "", 0.0
+
+    length = Counter(len(reading.value) for reading in readings).most_common(1)[0][0]
+    voters = [reading for reading in readings if len(reading.value) == length]
+
+    value, agreement = [], []
+    for position in range(length):
+        votes: Dict[str, float] = defaultdict(float)
+        for reading in voters:
+            votes[reading.value[position]] += reading.conf[position]
+        digit, weight = max(votes.items(), key=lambda item: item[1])
+        value.append(digit)
+        agreement.append(weight / sum(votes.values()))
+
+    confidence = float(np.mean(agreement)) * len(voters) / len(readings)
+    return "".join(value), confidence
+
+
+async def read_sequence(
+    frames: Iterator[np.ndarray], config: VideoConfig = video_config
+) -> SequenceReading:
+    """Распознает показания по упорядоченной последовательности кадров.
+
+    Кадры читаются частями по `keyframe_interval` в пуле потоков, и каждая
+    часть отправляется в пул инференса отдельной задачей: панель ищется на
+    ее первом кадре, а модель цифр запускается батчем на вырезках панели.
+    """
+
+    readings: List[FrameReading] = []
+    total = 0
+    while True:
+        chunk = await run_in_threadpool(
+            list, itertools.islice(frames, config.keyframe_interval)
+        )
+        if not chunk:
+            break
+        for offset, digits in enumerate(await batcher.run(read_chunk, chunk)):
+            readings.append(
+                FrameReading(
+                    frame=total + offset,
+                    keyframe=offset == 0,
+                    value=extract_value(digits),
+                    conf=ordered_confidences(digits),
+                )
+            )
+        total += len(chunk)
+
+    value, confidence = consensus(readings)
+    return SequenceReading(
+        value=value,
+        confidence=confidence,
+        frames_total=total,
+        frames_read=sum(1 for reading in readings if reading.value),
+        frames=readings,
+    )
+
+
+async def read_uploaded_video(
+    video: UploadFile, config: VideoConfig
+) -> SequenceReading:
+    """Сохраняет загруженное видео во временный файл и распознает его."""
+
+    suffix = Path(video.filename or "video.mp4").suffix
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        await run_in_threadpool(shutil.copyfileobj, video.file, tmp)
+        await run_in_threadpool(tmp.flush)
+        with closing(iter_video_frames(Path(tmp.name), config)) as frames:
+            return await read_sequence(frames, config)
+
+
+async def read_uploaded_frames(
+    frames: List[UploadFile], config: VideoConfig
+) -> SequenceReading:
+    """Распознает показания по упорядоченным кадрам-изображениям."""
+
+    images = (
+        bytes_to_array(frame.file.read()) for frame in frames[: config.max_frames]
+    )
+    return await read_sequence(images, config)
+
+
+router = APIRouter(
+    prefix="/video", tags=["Video"], dependencies=[Depends(require_ready)]
+)
+
+
+@router.post("/readings")
+async def read_video_results(
+    video: Optional[UploadFile] = File(None),
+    frames: Optional[List[UploadFile]] = File(None),
+    sample_fps: Optional[float] = Query(None, gt=0),
+    keyframe_interval: Optional[int] = Query(None, ge=1),
+    include_frames: bool = False,
+) -> Dict[str, Any]:
+    """Принимает видеофайл или последовательность кадров, возвращает общие показания."""
+
+    config = replace(
+        video_config,
+        sample_fps=sample_fps or video_config.sample_fps,
+        keyframe_interval=keyframe_interval or video_config.keyframe_interval,
+    )
+    if video is None and not frames:
+        raise HTTPException(status_code=422, detail="Send a video or frames")
+    if video_slots.locked():
+        VIDEO_REJECTED.inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Too many video requests",
+            headers={"Retry-After": str(batching_config.retry_after_s)},
+        )
+    async with video_slots:
+        try:
+            if video is not None:
+                result = await read_uploaded_video(video, config)
+            else:
+                result = await read_uploaded_frames(frames, config)  # type: ignore
+        except (ValueError, UnidentifiedImageError) as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
+    response = asdict(result)
+    if not include_frames:
+        response.pop("frames")
+    return response
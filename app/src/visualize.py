@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
@@ -26,78 +26,170 @@ FONT_THICKNESS = 2
 TEXT_COLOR = (255, 255, 255)
 
 
-def draw_transparent_rectangle(
-    image: MatLike,
-    start_point: Tuple[int, int],
-    end_point: Tuple[int, int],
-    color: Tuple[int, int, int],
-    thickness: int,
-    alpha: float = 0.8,
-) -> MatLike:
-    """Наносит прямоугольник с прозрачностью."""
+# Прозрачность рамок и подложек подписей
+ALPHA = 0.8
+
+# Отступы подложки подписи относительно левого верхнего угла рамки цифры
+LABEL_PAD_LEFT = 2
+LABEL_PAD_RIGHT = 10
+LABEL_PAD_TOP = 40
+LABEL_PAD_BOTTOM = 10
+
+# Поддерживаемые форматы вывода и их параметры качества OpenCV
+OUTPUT_FORMATS: Dict[str, Tuple[str, int]] = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+MEDIA_TYPES: Dict[str, str] = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def label_box(
+    coord: Tuple[int, int, int, int], text: str
+) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """Возвращает углы подложки подписи цифры."""
+
+    x1, y1 = int(coord[0]), int(coord[1])
+    (text_w, text_h), _ = cv2.getTextSize(text, FONT, FONT_SCALE, FONT_THICKNESS)
+    return (
+        (x1 - LABEL_PAD_LEFT, y1 - text_h - LABEL_PAD_TOP),
+        (x1 + text_w + LABEL_PAD_RIGHT, y1 - LABEL_PAD_BOTTOM),
+    )
 
-    overlay = image.copy()
-    cv2.rectangle(overlay, start_point, end_point, color, thickness)
-    return cv2.addWeighted(overlay, alpha, image, 1 - alpha, 0)
+
+def label_boxes(
+    classlabels: Dict[int, str], classes: np.ndarray, coords: np.ndarray
+) -> np.ndarray:
+    """Возвращает подложки подписей всех цифр как рамки (N,4)."""
+
+    return np.array(
+        [
+            [x1, y1, x2, y2]
+            for cls, coord in zip(classes.tolist(), coords.tolist())
+            for (x1, y1), (x2, y2) in [label_box(coord, classlabels[cls])]
+        ],
+        dtype=np.int32,
+    ).reshape(-1, 4)
+
+
+def shapes_region(
+    image: MatLike, boxes: np.ndarray, margin: int
+) -> Tuple[int, int, int, int]:
+    """Возвращает область изображения, которую затрагивают все рамки (N,4)."""
+
+    height, width = image.shape[:2]
+    xs, ys = boxes[:, [0, 2]], boxes[:, [1, 3]]
+    return (
+        max(int(xs.min()) - margin, 0),
+        max(int(ys.min()) - margin, 0),
+        min(int(xs.max()) + margin + 1, width),
+        min(int(ys.max()) + margin + 1, height),
+    )
 
 
 def draw_panel_rectangle(
-    image: MatLike, coords: List[Tuple[int, int, int, int]]
-) -> MatLike:
-    """Наносит панели счетчика."""
+    overlay: MatLike, coords: np.ndarray, offset: Tuple[int, int]
+) -> None:
+    """Наносит панели счетчика на слой разметки."""
 
-    for coord in coords:
-        x1, y1, x2, y2 = map(int, coord)
-        image = draw_transparent_rectangle(image, (x1, y1), (x2, y2), (255, 0, 0), 7)
-    return image
+    dx, dy = offset
+    for x1, y1, x2, y2 in coords.tolist():
+        cv2.rectangle(overlay, (x1 - dx, y1 - dy), (x2 - dx, y2 - dy), (255, 0, 0), 7)
 
 
 def draw_digits_rectangle(
-    image: MatLike,
-    classlabels: Dict[int, str],
-    classes: List[int],
-    coords: List[Tuple[int, int, int, int]],
-) -> MatLike:
-    """Наносит прямоугольники и текст для цифр."""
+    overlay: MatLike,
+    classes: np.ndarray,
+    coords: np.ndarray,
+    labels: np.ndarray,
+    offset: Tuple[int, int],
+) -> None:
+    """Наносит рамки цифр и подложки подписей на слой разметки."""
+
+    dx, dy = offset
+    for cls, (x1, y1, x2, y2), (bx1, by1, bx2, by2) in zip(
+        classes.tolist(), coords.tolist(), labels.tolist()
+    ):
+        cv2.rectangle(overlay, (x1 - dx, y1 - dy), (x2 - dx, y2 - dy), (0, 255, 0), 3)
 
-    for cls, coord in zip(classes, coords):
-        x1, y1, x2, y2 = map(int, coord)
-        image = draw_transparent_rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 3)
-
-        text = classlabels[cls]
         text_color_bg = COLORS.get(cls, (0, 0, 0))  # Цвет по умолчанию
-        text_size, _ = cv2.getTextSize(text, FONT, FONT_SCALE, FONT_THICKNESS)
-        text_w, text_h = text_size
-
-        # Рисуем фон для текста
-        image = draw_transparent_rectangle(
-            image,
-            (x1 - 2, y1 - text_h - 40),
-            (x1 + text_w + 10, y1 - 10),
-            text_color_bg,
-            -1,
+        cv2.rectangle(
+            overlay, (bx1 - dx, by1 - dy), (bx2 - dx, by2 - dy), text_color_bg, -1
         )
 
-        # Рисуем текст
+
+def draw_digits_text(
+    image: MatLike,
+    classlabels: Dict[int, str],
+    classes: np.ndarray,
+    coords: np.ndarray,
+) -> None:
+    """Наносит подписи цифр поверх смешанного изображения."""
+
+    for cls, (x1, y1, _, _) in zip(classes.tolist(), coords.tolist()):
         cv2.putText(
-            image, text, (x1 + 5, y1 - 26), FONT, FONT_SCALE, TEXT_COLOR, FONT_THICKNESS
+            image,
+            classlabels[cls],
+            (x1 + 5, y1 - 26),
+            FONT,
+            FONT_SCALE,
+            TEXT_COLOR,
+            FONT_THICKNESS,
         )
 
-    return image
-
 
 def visualize(
     image: np.ndarray, panels: List[DetectedObject], digits: List[DetectedObject]
 ) -> MatLike:
-    """Наносит результаты модели на изображение с визуализацией панелей и цифр."""
-
-    if panels and digits:
-        target_panels = panels[0]
-        target_digits = digits[0]
-
-        image = draw_panel_rectangle(image, target_panels.xyxy)  # type: ignore
-        image = draw_digits_rectangle(
-            image, target_digits.names, target_digits.cls, target_digits.xyxy  # type: ignore
-        )
-
-    return image
+    """Наносит результаты модели на изображение с визуализацией панелей и цифр.
+
+    Все рамки рисуются на одном слое размером с затронутую область,
+    который смешивается с изображением за один проход.
+    """
+
+    if not (panels and digits):
+        return image
+
+    target_panels = panels[0]
+    target_digits = digits[0]
+    labels = label_boxes(target_digits.names, target_digits.cls, target_digits.xyxy)
+    boxes = np.concatenate([target_panels.xyxy, target_digits.xyxy, labels])
+
+    result = np.array(image, copy=True)
+    if len(boxes):
+        x1, y1, x2, y2 = shapes_region(result, boxes, margin=7)
+        if x2 > x1 and y2 > y1:
+            region = result[y1:y2, x1:x2]
+            overlay = region.copy()
+            draw_panel_rectangle(overlay, target_panels.xyxy, (x1, y1))
+            draw_digits_rectangle(
+                overlay, target_digits.cls, target_digits.xyxy, labels, (x1, y1)
+            )
+            cv2.addWeighted(overlay, ALPHA, region, 1 - ALPHA, 0, dst=region)
+
+    draw_digits_text(result, target_digits.names, target_digits.cls, target_digits.xyxy)
+    return result
+
+
+def encode_image(
+    image: np.ndarray,
+    image_format: str = "jpeg",
+    quality: int = 75,
+    max_size: Optional[int] = None,
+) -> bytes:
+    """Кодирует RGB-изображение в JPEG или WebP, при необходимости уменьшая его."""
+
+    if image_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {image_format}")
+
+    height, width = image.shape[:2]
+    if max_size and max(height, width) > max_size:
+        factor = max_size / max(height, width)
+        size = (max(1, round(width * factor)), max(1, round(height * factor)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    extension, quality_flag = OUTPUT_FORMATS[image_format]
+    bgr = cv2.cvtColor(np.ascontiguousarray(image), cv2.COLOR_RGB2BGR)
+    ok, encoded = cv2.imencode(extension, bgr, [quality_flag, quality])
+    if not ok:
+        raise ValueError(f"Failed to encode image as {image_format}")
+    return encoded.tobytes()
@@ -0,0 +1,482 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+WORKER_RESTARTS = counter(
+    "inference_worker_restarts_total", "Inference worker processes restarted."
+)
+SHM_OVERFLOWS = counter(
+    "inference_shm_overflow_total",
+    "Batches that did not fit into the worker ring buffer.",
+)
+
+# Выравнивание массивов в кольцевом буфере
+ALIGNMENT = 64
+# Минимальное время жизни исполнителя, после которого он перезапускается сразу
+RESTART_DELAY_S = 5.0
+
+
+class WorkerCrashedError(RuntimeError):
+    """Процесс-исполнитель завершился, не вернув результат батча."""
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Ссылка на массив в разделяемой памяти вместо самого массива."""
+
+    name: str
+    offset: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def available_cores() -> List[int]:
+    """Возвращает ядра, доступные процессу."""
+
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def restart_time(started_at: float) -> float:
+    """Момент (по `time.monotonic`), когда можно перезапустить упавший процесс.
+
+    Процесс, проживший меньше `RESTART_DELAY_S`, перезапускается не сразу,
+    чтобы падающий при старте исполнитель не перезапускался в цикле.
+    """
+
+    return max(time.monotonic(), started_at + RESTART_DELAY_S)
+
+
+def worker_count(workers: int, threads: int) -> int:
+    """Число исполнителей; 0 -- по числу доступных ядер."""
+
+    if workers > 0:
+        return workers
+    return max(1, len(available_cores()) // max(1, threads))
+
+
+class RingBuffer:
+    """Кольцевой буфер в разделяемой памяти для кадров одного исполнителя.
+
+    Исполнитель обрабатывает батчи по порядку, поэтому место освобождается
+    в том же порядке, в каком выделялось.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.shm = SharedMemory(create=True, size=size)
+        self.size = size
+        self._allocations: Deque[Tuple[int, int]] = deque()
+
+    def allocate(self, size: int) -> Optional[int]:
+        """Выделяет непрерывный участок или возвращает None, если места нет."""
+
+        if not self._allocations:
+            start = 0 if size <= self.size else None
+        else:
+            first, head = self._allocations[0][0], self._allocations[-1][1]
+            if self._allocations[-1][0] < first:
+                # Запись уже перешла в начало буфера: свободно [head, first)
+                start = head if first - head >= size else None
+            elif self.size - head >= size:
+                start = head
+            else:
+                start = 0 if first >= size else None
+        if start is not None:
+            self._allocations.append((start, start + size))
+        return start
+
+    def release(self) -> None:
+        self._allocations.popleft()
+
+    def reset(self) -> None:
+        self._allocations.clear()
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+
+@dataclass
+class _Task:
+    future: Future
+    message: tuple
+    in_ring: bool
+    overflow: Optional[SharedMemory] = None
+
+
+@dataclass
+class _Worker:
+    index: int
+    cores: List[int]
+    ring: RingBuffer
+    process: Optional[multiprocessing.process.BaseProcess] = None
+    conn: Optional[Connection] = None
+    started_at: float = 0.0
+    ready: bool = False
+    restart_at: Optional[float] = None
+    # Отправленные исполнителю задачи и задачи, ожидающие его готовности
+    inflight: Dict[int, _Task] = field(default_factory=dict)
+    backlog: Deque[Tuple[int, _Task]] = field(default_factory=deque)
+
+
+def _attach(name: str, segments: Dict[str, SharedMemory]) -> SharedMemory:
+    if name not in segments:
+        segments[name] = SharedMemory(name=name)
+    return segments[name]
+
+
+def _resolve(value: Any, segments: Dict[str, SharedMemory]) -> Any:
+    """Заменяет ссылки на массивы представлениями разделяемой памяти без копий."""
+
+    if isinstance(value, SharedArray):
+        shm = _attach(value.name, segments)
+        return np.ndarray(value.shape, value.dtype, buffer=shm.buf, offset=value.offset)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_resolve(item, segments) for item in value)
+    return value
+
+
+def worker_main(
+    conn: Connection,
+    cores: List[int],
+    threads: int,
+    initializer: Optional[Callable[[], None]],
+) -> None:
+    """Главный цикл процесса-исполнителя: закрепляется на ядрах, грузит модели."""
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    import torch
+
+    torch.set_num_threads(max(1, threads))
+    try:
+        info = initializer() if initializer is not None else None
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        raise
+    conn.send(("ready", info))
+
+    segments: Dict[str, SharedMemory] = {}
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        task_id, fn, args, overflow = message
+        try:
+            result: Tuple[bool, Any] = (True, fn(*_resolve(args, segments)))
+        except Exception as e:
+            result = (False, e)
+        if overflow is not None and overflow in segments:
+            try:
+                segments.pop(overflow).close()
+            except BufferError:
+                pass  # представления еще живы, сегмент закроет сборщик мусора
+        try:
+            conn.send(("result", task_id, *result))
+        except Exception as e:
+            # Исключение или результат не сериализуются
+            conn.send(("result", task_id, False, RuntimeError(repr(e))))
+
+
+class SharedMemoryPool(Executor):
+    """Пул процессов инференса, получающих кадры через разделяемую память.
+
+    Каждый исполнитель закреплен за своими ядрами и имеет кольцевой буфер:
+    массивы NumPy из аргументов задачи копируются в буфер одним `memcpy`,
+    исполнителю уходят только ссылки на них. Упавший исполнитель
+    перезапускается, его незавершенные задачи завершаются ошибкой.
+    Результат `initializer` и его ошибка доступны как `info` и `error`.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        threads: int = 1,
+        buffer_bytes: int = 64 << 20,
+        initializer: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self._context = multiprocessing.get_context("spawn")
+        self._threads = threads
+        self._initializer = initializer
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closed = False
+        self.info: Any = None
+        self.error: Optional[str] = None
+
+        cores = available_cores()
+        count = worker_count(workers, threads)
+        self._workers = [
+            _Worker(
+                index=i,
+                cores=(
+                    cores[i::count] if count <= len(cores) else [cores[i % len(cores)]]
+                ),
+                ring=RingBuffer(buffer_bytes),
+            )
+            for i in range(count)
+        ]
+        for worker in self._workers:
+            self._start(worker)
+        self._collector = threading.Thread(
+            target=self._collect, name="inference-collector", daemon=True
+        )
+        self._collector.start()
+
+    @property
+    def ready(self) -> bool:
+        """Хотя бы один исполнитель загрузился и принимает задачи."""
+
+        return any(worker.ready for worker in self._workers)
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        if kwargs:
+            raise TypeError("SharedMemoryPool does not support keyword arguments")
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            # Готовый исполнитель с наименьшей очередью освободится раньше всех
+            worker = min(
+                self._workers,
+                key=lambda w: (not w.ready, len(w.inflight) + len(w.backlog)),
+            )
+            task_id = next(self._ids)
+            arrays = self._collect_arrays(args)
+            size = sum(aligned(array.nbytes) for array in arrays)
+            start = worker.ring.allocate(size) if arrays else None
+            overflow = None
+            if start is not None:
+                shm = worker.ring.shm
+            elif arrays:
+                SHM_OVERFLOWS.inc()
+                shm = overflow = SharedMemory(create=True, size=max(size, 1))
+                start = 0
+            refs: Dict[int, SharedArray] = {}
+            for array in arrays:
+                view = np.ndarray(
+                    array.shape, array.dtype, buffer=shm.buf, offset=start
+                )
+                view[...] = array
+                refs[id(array)] = SharedArray(
+                    shm.name, start, array.shape, array.dtype.str
+                )
+                start += aligned(array.nbytes)
+            message = (
+                task_id,
+                fn,
+                self._replace_arrays(args, refs),
+                overflow.name if overflow is not None else None,
+            )
+            task = _Task(future, message, in_ring=bool(arrays) and overflow is None)
+            task.overflow = overflow
+            if worker.ready:
+                self._send(worker, task_id, task)
+            else:
+                worker.backlog.append((task_id, task))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for worker in self._workers:
+                if worker.conn is not None and worker.process is not None:
+                    try:
+                        worker.conn.send(None)
+                    except OSError:
+                        pass
+        self._collector.join()
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=10 if wait else 1)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            self._fail(worker, RuntimeError("Inference pool is shut down"))
+            worker.ring.close()
+
+    @staticmethod
+    def _collect_arrays(
+        value: Any, arrays: Optional[Dict[int, np.ndarray]] = None
+    ) -> List[np.ndarray]:
+        """Собирает массивы из аргументов обходом `_replace_arrays`.
+
+        Один и тот же массив, переданный несколько раз, копируется один раз.
+        """
+
+        if arrays is None:
+            arrays = {}
+        if isinstance(value, np.ndarray):
+            arrays.setdefault(id(value), value)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                SharedMemoryPool._collect_arrays(item, arrays)
+        return list(arrays.values())
+
+    @staticmethod
+    def _replace_arrays(value: Any, refs: Dict[int, SharedArray]) -> Any:
+        if isinstance(value, np.ndarray):
+            return refs[id(value)]
+        if isinstance(value, (list, tuple)):
+            return type(value)(
+                SharedMemoryPool._replace_arrays(item, refs) for item in value
+            )
+        return value
+
+    def _start(self, worker: _Worker) -> None:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=worker_main,
+            args=(child, worker.cores, self._threads, self._initializer),
+            name=f"inference-{worker.index}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        worker.process, worker.conn = process, parent
+        worker.started_at = time.monotonic()
+        worker.ready = False
+        worker.restart_at = None
+
+    def _send(self, worker: _Worker, task_id: int, task: _Task) -> None:
+        assert worker.conn is not None
+        worker.inflight[task_id] = task
+        try:
+            worker.conn.send(task.message)
+        except OSError:
+            pass  # исполнитель упал, задачу завершит обработка его выхода
+
+    def _finish(self, task: _Task, ok: bool, value: Any) -> None:
+        if task.overflow is not None:
+            task.overflow.close()
+            task.overflow.unlink()
+        if task.future.done():
+            return
+        if ok:
+            task.future.set_result(value)
+        else:
+            task.future.set_exception(value)
+
+    def _fail(self, worker: _Worker, error: Exception) -> None:
+        tasks = list(worker.inflight.values()) + [task for _, task in worker.backlog]
+        worker.inflight.clear()
+        worker.backlog.clear()
+        worker.ring.reset()
+        for task in tasks:
+            self._finish(task, False, error)
+
+    def _handle(self, worker: _Worker) -> bool:
+        """Обрабатывает сообщение исполнителя; False, если канал закрыт."""
+
+        assert worker.conn is not None
+        try:
+            message = worker.conn.recv()
+        except (EOFError, OSError):
+            return False  # выход процесса обработается по его sentinel
+        if message[0] == "error":
+            self.error = message[1]
+            return True
+        if message[0] == "ready":
+            worker.ready = True
+            self.info, self.error = message[1], None
+            while worker.backlog:
+                self._send(worker, *worker.backlog.popleft())
+            return True
+        _, task_id, ok, value = message
+        task = worker.inflight.pop(task_id)
+        if task.in_ring:
+            worker.ring.release()
+        self._finish(task, ok, value)
+        return True
+
+    def _handle_exit(self, worker: _Worker) -> None:
+        assert worker.process is not None and worker.conn is not None
+        worker.process.join(timeout=1)
+        logger.warning(
+            "Inference worker %s exited with %s",
+            worker.process.pid,
+            worker.process.exitcode,
+        )
+        # Сообщения, отправленные перед выходом (ошибка загрузки, результаты)
+        while worker.conn.poll() and self._handle(worker):
+            pass
+        worker.conn.close()
+        inflight, worker.inflight = worker.inflight, {}
+        for task in inflight.values():
+            # Отправленные задачи старше ожидающих, их место в буфере -- первое
+            if task.in_ring:
+                worker.ring.release()
+            self._finish(task, False, WorkerCrashedError("Inference worker crashed"))
+        if not worker.ready:
+            # Исполнитель не загрузился (например, неверные веса): ожидающие
+            # его задачи не выполнятся и после перезапуска
+            error = WorkerCrashedError(
+                f"Inference worker failed to start: {self.error or 'exited'}"
+            )
+            while worker.backlog:
+                _, task = worker.backlog.popleft()
+                if task.in_ring:
+                    worker.ring.release()
+                self._finish(task, False, error)
+        # Иначе задачи, ожидающие готовности, получит перезапущенный исполнитель
+        worker.process = worker.conn = None
+        worker.ready = False
+        worker.restart_at = restart_time(worker.started_at)
+
+    def _collect(self) -> None:
+        """Принимает результаты исполнителей и следит за их процессами."""
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                for worker in self._workers:
+                    if (
+                        not self._closed
+                        and worker.process is None
+                        and worker.restart_at is not None
+                        and now >= worker.restart_at
+                    ):
+                        WORKER_RESTARTS.inc()
+                        self._start(worker)
+                running = [w for w in self._workers if w.process is not None]
+                handles: Dict[Any, Tuple[_Worker, bool]] = {}
+                for worker in running:
+                    handles[worker.conn] = (worker, False)
+                    handles[worker.process.sentinel] = (worker, True)  # type: ignore
+
+            for handle in wait(list(handles), timeout=0.1):
+                worker, exited = handles[handle]
+                with self._lock:
+                    if exited:
+                        # Сначала забираем результаты, отправленные до выхода
+                        while worker.conn.poll() and self._handle(worker):
+                            pass
+                        self._handle_exit(worker)
+                    elif worker.conn is handle and worker.process is not None:
+                        self._handle(worker)
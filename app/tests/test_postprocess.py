@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.postprocess import iou_matrix, overlap_matrix, suppress_duplicates
+
+# Широкая цифра, ее дубликат и рамка между ними по x1, ни с чем не пересекающаяся
+NON_ADJACENT = np.array(
+    [
+        [0, 0, 40, 50],
+        [5, 60, 15, 90],
+        [6, 0, 40, 50],
+    ]
+)
+
+
+def test_iou_matrix() -> None:
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    iou = iou_matrix(boxes, boxes)
+    assert np.allclose(np.diag(iou), 1)
+    assert np.isclose(iou[0, 1], 50 / 150)
+    assert iou[0, 2] == 0
+
+
+def test_overlap_matrix_divides_by_left_box() -> None:
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 25, 10]])
+    overlap = overlap_matrix(boxes)
+    assert np.isclose(overlap[0, 1], 0.5)
+    assert overlap[1, 0] == overlap[0, 1]
+    assert overlap[0, 0] == 0
+
+
+def test_suppress_non_adjacent_duplicate() -> None:
+    conf = np.array([0.9, 0.8, 0.7])
+    assert suppress_duplicates(NON_ADJACENT, conf).tolist() == [0, 1]
+    conf = np.array([0.6, 0.8, 0.7])
+    assert suppress_duplicates(NON_ADJACENT, conf).tolist() == [1, 2]
+
+
+def test_adjacent_only_keeps_baseline_behaviour() -> None:
+    conf = np.array([0.9, 0.8, 0.7])
+    keep = suppress_duplicates(NON_ADJACENT, conf, adjacent_only=True)
+    assert keep.tolist() == [0, 1, 2]
+
+
+def test_suppress_keeps_x1_order() -> None:
+    boxes = np.array([[50, 0, 80, 50], [0, 0, 30, 50], [2, 0, 30, 50]])
+    conf = np.array([0.9, 0.5, 0.8])
+    assert suppress_duplicates(boxes, conf).tolist() == [2, 0]
+    assert suppress_duplicates(np.zeros((0, 4)), np.zeros(0)).tolist() == []
@@ -0,0 +1,16 @@
+from pathlib import Path
+
+from benchmarks.common import parse_ground_truth, reading_matches
+
+
+def test_ground_truth_restores_fraction_zeros() -> None:
+    assert parse_ground_truth(Path("id_12_value_414_676.jpg")) == "414676"
+    assert parse_ground_truth(Path("id_1029_value_409_55.jpg")) == "409550"
+
+
+def test_reading_matches_ignores_only_leading_zeros() -> None:
+    assert reading_matches("00409550", "409550")
+    assert reading_matches("0000000", "0000")
+    assert not reading_matches("100", "1")
+    assert not reading_matches("1230", "123")
+    assert not reading_matches("", "0100")
@@ -0,0 +1,86 @@
+"""Сравнивает загрузку обучающих примеров из JPEG и из кэша уменьшенных изображений.
+
+Собирает датасет YOLO из увеличенных копий фотографий data/images
+(снимки Толоки -- около 12 Мп) и замеряет, сколько примеров в секунду
+выдает датасет ultralytics с аугментациями в одном процессе, то есть
+сколько работы снимается с загрузчиков данных.
+
+Запуск из корня репозитория: python -m benchmarks.image_cache
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+from ultralytics.cfg import get_cfg
+from ultralytics.data.dataset import YOLODataset
+
+from src.image_cache import attach_image_cache, build_image_cache
+
+
+def make_dataset(images_dir: Path, root: Path, count: int, megapixels: float) -> Path:
+    """Сохраняет увеличенные копии фото с разметкой одной рамки."""
+
+    image_dir, label_dir = root / "images", root / "labels"
+    image_dir.mkdir(parents=True)
+    label_dir.mkdir()
+    sources = sorted(images_dir.glob("*.jpg"))
+    for i in range(count):
+        img = Image.open(sources[i % len(sources)]).convert("RGB")
+        factor = (megapixels * 1e6 / (img.width * img.height)) ** 0.5
+        img = img.resize((int(img.width * factor), int(img.height * factor)))
+        img.save(image_dir / f"{i}.jpg", quality=90)
+        (label_dir / f"{i}.txt").write_text("0 0.5 0.5 0.2 0.1\n")
+    return image_dir
+
+
+def measure(dataset: YOLODataset, epochs: int) -> float:
+    """Возвращает число примеров в секунду за несколько эпох."""
+
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for i in range(len(dataset)):
+            dataset[i]
+    return epochs * len(dataset) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=Path, default=Path("data/images"))
+    parser.add_argument("--count", type=int, default=64)
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--img-size", type=int, default=640)
+    parser.add_argument("--epochs", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        image_dir = make_dataset(args.images, root, args.count, args.megapixels)
+        hyp = get_cfg(overrides={"imgsz": args.img_size})
+
+        def dataset() -> YOLODataset:
+            return YOLODataset(
+                img_path=str(image_dir),
+                imgsz=args.img_size,
+                batch_size=16,
+                augment=True,
+                hyp=hyp,
+                data={"names": {0: "Panel"}, "channels": 3},
+            )
+
+        print(f"{args.count} фото {args.megapixels:g} Мп -> {args.img_size}px")
+        print(f"  JPEG          {measure(dataset(), args.epochs):8.1f} примеров/с")
+
+        start = time.perf_counter()
+        build_image_cache(image_dir, root / "cache", args.img_size)
+        print(f"  построение кэша {time.perf_counter() - start:6.1f} с")
+
+        cached = dataset()
+        attach_image_cache(cached, root / "cache", hyp)
+        print(f"  кэш (memmap)  {measure(cached, args.epochs):8.1f} примеров/с")
+
+
+if __name__ == "__main__":
+    main()
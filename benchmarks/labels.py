@@ -0,0 +1,157 @@
+"""Сравнивает прежнюю конвертацию разметки с потоковой параллельной.
+
+Генерирует синтетические экспорты (CSV панелей и JSON Label Studio)
+и замеряет пропускную способность первого и повторного запуска.
+
+Запуск из корня репозитория: python -m benchmarks.labels
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from src.labels import (
+    convert_labels,
+    extract_label_from_row,
+    extract_label_studio_labels,
+    extract_labels,
+)
+
+CLASS_LABELS = {i: str(i) for i in range(10)}
+
+
+def make_csv_export(path: Path, count: int) -> None:
+    """Создает CSV в формате датасета панелей."""
+
+    with path.open("w", encoding="utf-8") as f:
+        f.write("photo_name,value,location\n")
+        for i in range(count):
+            points = [
+                {"x": round(random.random(), 6), "y": round(random.random(), 6)}
+                for _ in range(4)
+            ]
+            location = str({"type": "polygon", "data": points})
+            f.write(f'id_{i}_value_{i % 1000}_{i % 100}.jpg,{i},"{location}"\n')
+
+
+def make_label_studio_export(path: Path, count: int) -> None:
+    """Создает JSON-экспорт Label Studio одним файлом."""
+
+    def box(cls: int) -> dict:
+        return {
+            "value": {
+                "x": random.uniform(0, 90),
+                "y": random.uniform(0, 90),
+                "width": random.uniform(1, 10),
+                "height": random.uniform(1, 10),
+                "rectanglelabels": [str(cls)],
+            }
+        }
+
+    with path.open("w", encoding="utf-8") as f:
+        f.write("[")
+        for i in range(count):
+            task = {
+                "id": i,
+                "data": {"image": f"/data/upload/1/{i:08d}.jpg"},
+                "annotations": [{"result": [box(c) for c in range(8)]}],
+            }
+            f.write(("," if i else "") + json.dumps(task))
+        f.write("]")
+
+
+def legacy_extract_labels(path: Path) -> None:
+    """Прежняя конвертация CSV: pandas.iterrows и запись по одному файлу."""
+
+    data = pd.read_csv(path)
+    for _, row in data.iterrows():
+        label_path = (path.parent / "labels" / row["photo_name"]).with_suffix(".txt")
+        label_path.parent.mkdir(parents=True, exist_ok=True)
+        label_path.write_text(extract_label_from_row(row), encoding="utf-8")
+
+
+def legacy_extract_label_studio_labels(path: Path, output: Path) -> None:
+    """Прежняя конвертация: весь экспорт в памяти, последовательная запись."""
+
+    output.mkdir(parents=True, exist_ok=True)
+    for task in json.loads(path.read_text(encoding="utf-8")):
+        data = {"result": task["annotations"][-1]["result"]}
+        labels_str = convert_labels(data, CLASS_LABELS)
+        file_name = Path(task["data"]["image"]).name
+        with (output / Path(file_name).with_suffix(".txt")).open(
+            "w", encoding="utf-8"
+        ) as f:
+            for l_str in labels_str:
+                f.write(f"{l_str}\n")
+
+
+def measure(name: str, count: int, fn: Callable[[], object]) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {elapsed:8.2f} с {count / elapsed:12.0f} записей/с")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+
+        csv_dir = root / "csv"
+        csv_dir.mkdir()
+        csv_path = csv_dir / "data.csv"
+        make_csv_export(csv_path, args.count)
+        print(f"CSV панелей, {args.count} записей")
+        measure("pandas.iterrows", args.count, lambda: legacy_extract_labels(csv_path))
+        for path in (csv_dir / "labels").iterdir():
+            path.unlink()
+        measure(
+            "поток + пул процессов",
+            args.count,
+            lambda: extract_labels(csv_path, args.workers),
+        )
+        measure(
+            "повторный запуск",
+            args.count,
+            lambda: extract_labels(csv_path, args.workers),
+        )
+
+        ls_dir = root / "label-studio"
+        ls_dir.mkdir()
+        export_path = ls_dir / "export.json"
+        make_label_studio_export(export_path, args.count)
+        print(f"\nЭкспорт Label Studio, {args.count} задач")
+        measure(
+            "json.load + запись по файлу",
+            args.count,
+            lambda: legacy_extract_label_studio_labels(export_path, root / "legacy"),
+        )
+        output = root / "labels"
+        measure(
+            "поток + пул процессов",
+            args.count,
+            lambda: extract_label_studio_labels(
+                ls_dir, output, CLASS_LABELS, args.workers
+            ),
+        )
+        measure(
+            "повторный запуск",
+            args.count,
+            lambda: extract_label_studio_labels(
+                ls_dir, output, CLASS_LABELS, args.workers
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
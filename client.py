@@ -1,47 +1,192 @@
+import argparse
 import asyncio
+import csv
+import json
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
 
 import httpx
 
+from app.src.offline import collect_images, load_done
 
-# Отправка изображения и получение его обратно
-async def send_image_return(file_path: str):
-    async with httpx.AsyncClient() as client:
-        with open(file_path, "rb") as image_file:
-            files = {"image": (image_file.name, image_file, "image/jpeg")}
-            response = await client.post(
-                "http://127.0.0.1:80/image/visualize", files=files
-            )
-            if response.status_code == 200:
-                with open("returned_image.jpg", "wb") as f:
-                    f.write(response.content)
-                print(
-                    "Изображение успешно получено обратно и сохранено как 'returned_image.jpg'"
-                )
-            else:
-                print(f"Ошибка: {response.status_code} - {response.text}")
-
-
-# Отправка изображения и получение описания
-async def send_image_describe(file_path: str):
-    async with httpx.AsyncClient() as client:
-        with open(file_path, "rb") as image_file:
-            files = {"image": (image_file.name, image_file, "image/jpeg")}
-            response = await client.post(
-                "http://127.0.0.1:80/image/readings", files=files
+RETRY_STATUSES = {429, 503}
+CSV_FIELDS = ["path", "status", "value", "error", "latency_ms", "attempts"]
+
+
+@dataclass
+class Stats:
+    latencies: List[float] = field(default_factory=list)
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+
+
+class ResultWriter:
+    """Дописывает результаты в CSV или JSONL сразу по мере получения."""
+
+    def __init__(self, output: Path) -> None:
+        self.output = output
+        self.is_csv = output.suffix == ".csv"
+        new_file = not output.exists() or output.stat().st_size == 0
+        self.file = output.open("a", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, CSV_FIELDS) if self.is_csv else None
+        if self.writer is not None and new_file:
+            self.writer.writeheader()
+
+    def write(self, row: Dict) -> None:
+        if self.writer is not None:
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def retry_delay(response: Optional[httpx.Response], attempt: int, base: float) -> float:
+    """Возвращает паузу перед повтором: Retry-After сервера или экспоненциальную."""
+
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    return base * 2**attempt * (0.5 + random.random())
+
+
+async def send_image(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    path: Path,
+    max_retries: int,
+    backoff: float,
+    stats: Stats,
+) -> Dict:
+    """Отправляет изображение с повторами при перегрузке сервиса."""
+
+    data = path.read_bytes()
+    response: Optional[httpx.Response] = None
+    error = None
+    start = time.perf_counter()
+    for attempt in range(max_retries + 1):
+        try:
+            files = {"image": (path.name, data, "image/jpeg")}
+            response = await client.post(endpoint, files=files)
+            error = None
+            if response.status_code not in RETRY_STATUSES:
+                break
+        except httpx.TransportError as e:
+            response, error = None, f"{type(e).__name__}: {e}"
+        if attempt < max_retries:
+            stats.retries += 1
+            await asyncio.sleep(retry_delay(response, attempt, backoff))
+    latency = time.perf_counter() - start
+
+    row = {
+        "path": str(path),
+        "status": response.status_code if response is not None else None,
+        "value": None,
+        "error": error,
+        "latency_ms": round(latency * 1000, 1),
+        "attempts": attempt + 1,
+    }
+    if response is not None and response.status_code == 200:
+        row["value"] = response.json().get("value")
+        stats.latencies.append(latency)
+        stats.succeeded += 1
+    else:
+        if response is not None:
+            row["error"] = response.text[:200]
+        stats.failed += 1
+    return row
+
+
+async def run(args: argparse.Namespace) -> None:
+    images = collect_images(args.source)
+    done = set()
+    if args.resume:
+        done = load_done(args.output, lambda row: str(row["status"]) == "200")
+    pending = [path for path in images if str(path) not in done]
+    print(f"Изображений: {len(images)}, уже обработано: {len(done)}")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in pending:
+        queue.put_nowait(path)
+
+    stats = Stats()
+    writer = ResultWriter(args.output)
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while not queue.empty():
+            path = queue.get_nowait()
+            row = await send_image(
+                client, args.endpoint, path, args.retries, args.backoff, stats
             )
-            if response.status_code == 200:
-                print(response.json())
-            else:
-                print(f"Ошибка: {response.status_code} - {response.text}")
+            writer.write(row)
 
+    start = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(
+            base_url=args.url,
+            http2=args.http2,
+            limits=limits,
+            timeout=args.timeout,
+        ) as client:
+            await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
 
-# Запуск клиентов
-if __name__ == "__main__":
-    # Укажите путь к вашему изображению
-    image_path = "data/images/id_12_value_414_676.jpg"
+    report(stats, elapsed)
 
-    # Отправить изображение и получить его обратно
-    asyncio.run(send_image_return(image_path))
 
-    # Отправить изображение и получить описание
-    asyncio.run(send_image_describe(image_path))
+def report(stats: Stats, elapsed: float) -> None:
+    """Печатает пропускную способность и распределение задержек."""
+
+    total = stats.succeeded + stats.failed
+    print(
+        f"Обработано: {total} за {elapsed:.1f} с "
+        f"({total / elapsed if elapsed else 0:.2f} изображений/с), "
+        f"успешно: {stats.succeeded}, ошибок: {stats.failed}, повторов: {stats.retries}"
+    )
+    if len(stats.latencies) >= 2:
+        ms = [t * 1000 for t in stats.latencies]
+        quantiles = statistics.quantiles(ms, n=100)
+        print(
+            f"Задержка, мс: mean={statistics.fmean(ms):.1f} p50={quantiles[49]:.1f} "
+            f"p95={quantiles[94]:.1f} p99={quantiles[98]:.1f} max={max(ms):.1f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Пакетная отправка фотографий счетчиков в сервис распознавания."
+    )
+    parser.add_argument("source", type=Path, help="каталог с фото или файл-манифест")
+    parser.add_argument("--url", default="http://127.0.0.1:80")
+    parser.add_argument("--endpoint", default="/image/readings")
+    parser.add_argument("--output", type=Path, default=Path("readings.jsonl"))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--backoff", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--http2", action="store_true", help="требует пакет h2")
+    parser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="не пропускать изображения, уже записанные в --output",
+    )
+    return parser.parse_args()
+
+
+# Запуск клиента
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,127 @@
+import argparse
+import random
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import yaml
+from PIL import Image
+from ultralytics import YOLO
+from ultralytics.data.augment import LetterBox
+
+from src.config import ExportConfig, export_config_digits, export_config_panels
+
+
+def calibration_images(config: ExportConfig) -> list[Path]:
+    """Возвращает случайную выборку обучающих изображений для калибровки INT8."""
+
+    with config.yaml_path.open(encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    images_dir = Path(data["path"]) / data["train"]
+    images = sorted(p for p in images_dir.iterdir() if p.is_file())
+    sample_size = max(1, int(len(images) * config.calibration_fraction))
+    random.seed(42)
+    return random.sample(images, min(sample_size, len(images)))
+
+
+class CalibrationReader:
+    """Подает в квантизатор ONNX Runtime изображения в формате входа модели."""
+
+    def __init__(self, input_name: str, images: list[Path], img_size: int) -> None:
+        self.input_name = input_name
+        self.images = iter(images)
+        self.letterbox = LetterBox(new_shape=(img_size, img_size), auto=False)
+
+    def get_next(self) -> dict[str, np.ndarray] | None:
+        path = next(self.images, None)
+        if path is None:
+            return None
+        img = self.letterbox(image=np.array(Image.open(path).convert("RGB")))
+        tensor = img.transpose(2, 0, 1)[None].astype(np.float32) / 255
+        return {self.input_name: np.ascontiguousarray(tensor)}
+
+
+def quantize_onnx(onnx_path: Path, config: ExportConfig) -> Path:
+    """Выполняет статическую INT8-квантизацию ONNX-модели."""
+
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    output_path = onnx_path.with_name(onnx_path.stem + "_int8.onnx")
+    session = onnxruntime.InferenceSession(
+        str(onnx_path), providers=["CPUExecutionProvider"]
+    )
+    reader = CalibrationReader(
+        session.get_inputs()[0].name, calibration_images(config), config.img_size
+    )
+    quantize_static(
+        str(onnx_path),
+        str(output_path),
+        reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+    # Метаданные (классы, задача, размер входа) нужны ultralytics при загрузке
+    source = onnx.load(str(onnx_path))
+    quantized = onnx.load(str(output_path))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, str(output_path))
+    return output_path
+
+
+def export_model(config: ExportConfig) -> list[Path]:
+    """Экспортирует модель во все форматы из конфигурации."""
+
+    exported = []
+    for fmt in config.formats:
+        model = YOLO(config.model_path, task=config.task.value)
+        if fmt == "onnx":
+            path = Path(
+                model.export(format="onnx", imgsz=config.img_size, dynamic=True)
+            )
+            exported.append(path)
+            if config.int8:
+                exported.append(quantize_onnx(path, config))
+        elif fmt == "openvino":
+            path = model.export(format="openvino", imgsz=config.img_size, dynamic=True)
+            exported.append(Path(path))
+            if config.int8:
+                path = YOLO(config.model_path, task=config.task.value).export(
+                    format="openvino",
+                    imgsz=config.img_size,
+                    dynamic=True,
+                    int8=True,
+                    data=str(config.yaml_path),
+                    fraction=config.calibration_fraction,
+                )
+                exported.append(Path(path))
+        else:
+            raise ValueError(f"Unsupported export format: {fmt}")
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Экспорт моделей панелей и цифр в ONNX и OpenVINO."
+    )
+    parser.add_argument("--formats", nargs="+", choices=["onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true", help="INT8-квантизация")
+    args = parser.parse_args()
+
+    for config in (export_config_panels, export_config_digits):
+        config = replace(
+            config,
+            formats=args.formats or config.formats,
+            int8=args.int8 or config.int8,
+        )
+        for path in export_model(config):
+            print(f"Exported: {path}")
+
+
+if __name__ == "__main__":
+    main()
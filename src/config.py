@@ -2,12 +2,19 @@ from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
 
+import torch
+
 
 class Task(Enum):
     SEGMENT = "segment"
     DETECT = "detect"
 
 
+def default_device() -> int | str:
+    """Возвращает первую GPU, если она есть, иначе CPU."""
+    return 0 if torch.cuda.is_available() else "cpu"
+
+
 @dataclass
 class DatasetConfig:
     dataset_path: Path
@@ -26,6 +33,12 @@ class DigitsDatasetConfig(DatasetConfig):
     labels_output_path: Path
 
 
+@dataclass
+class MaterializeConfig:
+    mode: str
+    workers: int
+
+
 @dataclass
 class TrainConfig:
     model_path: Path
@@ -33,6 +46,12 @@ class TrainConfig:
     batch_size: int
     img_size: int
     project_path: Path
+    device: int | str
+    # Кэш уменьшенных изображений выборок, None -- обучение на исходных JPEG
+    cache_path: Path | None
+    cache_workers: int
+    # Печатать в конце эпохи скорость загрузки данных и вычислений
+    profile: bool
 
 
 @dataclass
@@ -42,6 +61,18 @@ class TestConfig:
     img_size: int
     conf: float
     project_path: Path
+    device: int | str
+
+
+@dataclass
+class ExportConfig:
+    model_path: Path
+    task: Task
+    formats: list[str]
+    img_size: int
+    int8: bool
+    yaml_path: Path
+    calibration_fraction: float
 
 
 dataset_config_panels = PanelsDatasetConfig(
@@ -79,6 +110,9 @@ dataset_config_digits = DigitsDatasetConfig(
     },
 )
 
+# Файлы датасета создаются жесткими ссылками на исходники, без копирования
+materialize_config = MaterializeConfig(mode="hardlink", workers=8)
+
 train_config_panels = TrainConfig(
     model_path=Path("yolov8n-seg.pt"),
     yaml_path=Path(
@@ -89,6 +123,10 @@ train_config_panels = TrainConfig(
     project_path=Path(
         "/home/vbabchuk/research/cv-water-meters/models/train/panels/runs/training"
     ),
+    device=default_device(),
+    cache_path=dataset_config_panels.dataset_path / "cache",
+    cache_workers=8,
+    profile=False,
 )
 
 
@@ -102,6 +140,10 @@ train_config_digits = TrainConfig(
     project_path=Path(
         "/home/vbabchuk/research/cv-water-meters/models/train/digits/runs/training"
     ),
+    device=default_device(),
+    cache_path=dataset_config_digits.dataset_path / "cache",
+    cache_workers=8,
+    profile=False,
 )
 
 
@@ -117,6 +159,7 @@ test_config_panels = TestConfig(
     project_path=Path(
         "/home/vbabchuk/research/cv-water-meters/models/train/panels/runs/predicting"
     ),
+    device=default_device(),
 )
 
 
@@ -132,4 +175,27 @@ test_config_digits = TestConfig(
     project_path=Path(
         "/home/vbabchuk/research/cv-water-meters/models/train/digits/runs/predicting"
     ),
+    device=default_device(),
+)
+
+
+export_config_panels = ExportConfig(
+    model_path=test_config_panels.model_path,
+    task=Task.SEGMENT,
+    formats=["onnx", "openvino"],
+    img_size=640,
+    int8=False,
+    yaml_path=train_config_panels.yaml_path,
+    calibration_fraction=0.1,
+)
+
+
+export_config_digits = ExportConfig(
+    model_path=test_config_digits.model_path,
+    task=Task.DETECT,
+    formats=["onnx", "openvino"],
+    img_size=640,
+    int8=False,
+    yaml_path=train_config_digits.yaml_path,
+    calibration_fraction=0.1,
 )
@@ -1,17 +1,115 @@
+import hashlib
+import json
 import os
 import random
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import yaml
 
+MANIFEST_NAME = "manifest.json"
+LINK_MODES = ("copy", "hardlink", "symlink")
+
+
+def file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Возвращает хэш содержимого файла."""
+
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir: Path) -> dict[str, dict]:
+    """Загружает манифест материализованных файлов датасета."""
+
+    manifest_path = output_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    with manifest_path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir: Path, manifest: dict[str, dict]) -> None:
+    """Атомарно сохраняет манифест датасета."""
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_dir / f"{MANIFEST_NAME}.tmp"
+    with tmp_path.open(mode="w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    tmp_path.replace(output_dir / MANIFEST_NAME)
+
+
+def materialize_file(src: Path, dst: Path, mode: str) -> None:
+    """Создает файл датасета копированием, жесткой или символической ссылкой."""
+
+    if dst.is_symlink() or dst.exists():
+        dst.unlink()
+    if mode == "symlink":
+        dst.symlink_to(src.resolve())
+    elif mode == "hardlink":
+        try:
+            os.link(src, dst)
+        except OSError:
+            # Разные файловые системы: ссылку создать нельзя
+            shutil.copy2(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+def sync_file(src: Path, dst: Path, entry: dict | None, mode: str) -> tuple[dict, bool]:
+    """Обновляет файл датасета, если исходник изменился.
+
+    Сначала сравниваются размер и время изменения, хэш содержимого
+    считается только при их расхождении. Возвращает новую запись
+    манифеста и признак того, что файл был записан.
+    """
+
+    stat = src.stat()
+    record = {
+        "source": str(src),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "mode": mode,
+    }
+    reusable = (
+        entry is not None
+        and dst.exists()
+        and entry["mode"] == mode
+        and entry["source"] == record["source"]
+    )
+    if reusable and (entry["size"], entry["mtime_ns"]) == (  # type: ignore
+        record["size"],
+        record["mtime_ns"],
+    ):
+        return entry, False  # type: ignore
+
+    record["hash"] = file_hash(src)
+    if reusable and entry["hash"] == record["hash"]:  # type: ignore
+        return record, False
+
+    materialize_file(src, dst, mode)
+    return record, True
+
 
 def copy_split_data(
     dir_name: str,
     path_list: list[tuple[Path, Path]],
     output_dir: Path,
-):
-    """Копирует изображения и метки в train, val, test."""
+    mode: str = "copy",
+    workers: int = 8,
+) -> int:
+    """Копирует изображения и метки в train, val, test.
+
+    Неизмененные файлы пропускаются по манифесту с хэшами содержимого,
+    файлы, которые больше не входят в выборку, удаляются. Режим `mode`:
+    `copy`, `hardlink` или `symlink`. Возвращает число записанных файлов.
+    """
+
+    if mode not in LINK_MODES:
+        raise ValueError(f"Unknown mode: {mode}, expected one of {LINK_MODES}")
 
     split_image_dir = output_dir / dir_name / "images"
     split_label_dir = output_dir / dir_name / "labels"
@@ -19,9 +117,33 @@ def copy_split_data(
     split_image_dir.mkdir(parents=True, exist_ok=True)
     split_label_dir.mkdir(parents=True, exist_ok=True)
 
+    manifest = load_manifest(output_dir)
+    targets: dict[str, tuple[Path, Path]] = {}
     for img_file, lbl_file in path_list:
-        shutil.copy(img_file, split_image_dir)
-        shutil.copy(lbl_file, split_label_dir)
+        for src, dst_dir in ((img_file, split_image_dir), (lbl_file, split_label_dir)):
+            dst = dst_dir / src.name
+            targets[str(dst.relative_to(output_dir))] = (src, dst)
+
+    # Удаление файлов, которые больше не входят в эту выборку
+    for split_dir in (split_image_dir, split_label_dir):
+        for path in split_dir.iterdir():
+            key = str(path.relative_to(output_dir))
+            if key not in targets:
+                path.unlink()
+                manifest.pop(key, None)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            key: executor.submit(sync_file, src, dst, manifest.get(key), mode)
+            for key, (src, dst) in targets.items()
+        }
+        written = 0
+        for key, future in futures.items():
+            manifest[key], changed = future.result()
+            written += changed
+
+    save_manifest(output_dir, manifest)
+    return written
 
 
 def train_test_split(
@@ -35,13 +157,16 @@ def train_test_split(
     if sum(split_ratios) != 1:
         raise ValueError("The sum of the shares must be equal to 1")
 
-    image_files = sorted([p for p in image_dir.iterdir() if p.is_file()])
-    label_files = sorted([p for p in label_dir.iterdir() if p.is_file()])
+    image_files = {p.stem: p for p in image_dir.iterdir() if p.is_file()}
+    label_files = {p.stem: p for p in label_dir.iterdir() if p.is_file()}
 
-    if len(image_files) != len(label_files):
-        raise ValueError("The number of images and labels must match")
+    if image_files.keys() != label_files.keys():
+        missing = len(image_files.keys() ^ label_files.keys())
+        raise ValueError(f"Images and labels must match by name, {missing} unpaired")
 
-    paired_files = list(zip(image_files, label_files))
+    paired_files = [
+        (image_files[stem], label_files[stem]) for stem in sorted(image_files)
+    ]
     random.seed(seed)
     random.shuffle(paired_files)
 
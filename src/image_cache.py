@@ -0,0 +1,210 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import cv2
+import numpy as np
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.models.yolo.segment import SegmentationTrainer
+from ultralytics.utils import LOGGER
+
+INDEX_NAME = "index.json"
+IMAGES_NAME = "images.npy"
+# Цвет полей, как у letterbox в ultralytics
+PAD_VALUE = 114
+
+
+def resize_long_side(im: np.ndarray, img_size: int) -> np.ndarray:
+    """Уменьшает изображение до `img_size` по длинной стороне, как ultralytics."""
+
+    h0, w0 = im.shape[:2]
+    r = img_size / max(h0, w0)
+    if r == 1:
+        return im
+    w = min(int(np.ceil(w0 * r)), img_size)
+    h = min(int(np.ceil(h0 * r)), img_size)
+    return cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+
+
+def load_index(cache_dir: Path) -> dict[str, Any]:
+    """Загружает индекс кэша изображений выборки."""
+
+    index_path = cache_dir / INDEX_NAME
+    if not index_path.exists() or not (cache_dir / IMAGES_NAME).exists():
+        return {}
+    with index_path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_index(cache_dir: Path, index: dict[str, Any]) -> None:
+    """Атомарно сохраняет индекс кэша."""
+
+    tmp_path = cache_dir / f"{INDEX_NAME}.tmp"
+    with tmp_path.open(mode="w", encoding="utf-8") as f:
+        json.dump(index, f)
+    tmp_path.replace(cache_dir / INDEX_NAME)
+
+
+def file_record(path: Path) -> dict[str, Any]:
+    stat = path.stat()
+    return {"name": path.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_fresh(entry: dict[str, Any], record: dict[str, Any]) -> bool:
+    return (entry["size"], entry["mtime_ns"]) == (record["size"], record["mtime_ns"])
+
+
+def build_image_cache(
+    image_dir: Path, cache_dir: Path, img_size: int, workers: int = 8
+) -> int:
+    """Уменьшает изображения выборки один раз и складывает их в массив uint8.
+
+    Каждое изображение уменьшается до `img_size` по длинной стороне и
+    кладется в левый верхний угол ячейки `img_size x img_size` с полями
+    (N, S, S, 3) в `images.npy`, который обучение читает через memmap.
+    Неизмененные изображения берутся из прежнего кэша без декодирования.
+    Возвращает число заново декодированных изображений.
+    """
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    files = sorted(p for p in image_dir.iterdir() if p.is_file())
+    records = [file_record(path) for path in files]
+
+    old_index = load_index(cache_dir)
+    if old_index.get("img_size") != img_size:
+        old_index = {}
+    old_entries = {entry["name"]: entry for entry in old_index.get("entries", [])}
+    if len(old_entries) == len(records) and all(
+        record["name"] in old_entries and is_fresh(old_entries[record["name"]], record)
+        for record in records
+    ):
+        return 0
+
+    old_images = (
+        np.load(cache_dir / IMAGES_NAME, mmap_mode="r") if old_entries else None
+    )
+    tmp_path = cache_dir / f"{IMAGES_NAME}.tmp"
+    images = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.uint8, shape=(len(files), img_size, img_size, 3)
+    )
+
+    def fill(slot: int) -> tuple[dict[str, Any] | None, bool]:
+        path, record = files[slot], records[slot]
+        old = old_entries.get(record["name"])
+        if old is not None and old_images is not None and is_fresh(old, record):
+            images[slot] = old_images[old["slot"]]
+            return {**old, "slot": slot}, False
+
+        im = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if im is None:
+            LOGGER.warning(f"Failed to cache image {path}")
+            return None, False
+        h0, w0 = im.shape[:2]
+        im = resize_long_side(im, img_size)
+        h, w = im.shape[:2]
+        images[slot] = PAD_VALUE
+        images[slot, :h, :w] = im
+        return {**record, "slot": slot, "hw0": [h0, w0], "hw": [h, w]}, True
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fill, range(len(files))))
+
+    images.flush()
+    del images, old_images
+    tmp_path.replace(cache_dir / IMAGES_NAME)
+    save_index(
+        cache_dir,
+        {
+            "img_size": img_size,
+            "entries": [entry for entry, _ in results if entry is not None],
+        },
+    )
+    return sum(written for _, written in results)
+
+
+def cache_dataset_images(
+    dataset_path: Path,
+    cache_path: Path,
+    img_size: int,
+    workers: int = 8,
+    splits: tuple[str, ...] = ("train", "val"),
+) -> int:
+    """Строит кэш изображений для выборок датасета YOLO."""
+
+    return sum(
+        build_image_cache(
+            dataset_path / split / "images", cache_path / split, img_size, workers
+        )
+        for split in splits
+    )
+
+
+def attach_image_cache(dataset: YOLODataset, cache_dir: Path, hyp: Any) -> int:
+    """Подставляет в датасет изображения из кэша вместо чтения JPEG.
+
+    Изображения отдаются представлениями memmap только для чтения через
+    штатный механизм кэша ultralytics в памяти (`dataset.ims`), поэтому
+    аугментации работают без изменений. Изображения, изменившиеся после
+    построения кэша, читаются как обычно. `hyp` -- гиперпараметры, с которыми
+    создан датасет. Возвращает число изображений из кэша.
+    """
+
+    index = load_index(cache_dir)
+    if index.get("img_size") != dataset.imgsz or getattr(dataset, "channels", 3) != 3:
+        return 0
+
+    images = np.load(cache_dir / IMAGES_NAME, mmap_mode="r")
+    entries = {entry["name"]: entry for entry in index["entries"]}
+    attached = 0
+    for i, im_file in enumerate(dataset.im_files):
+        path = Path(im_file)
+        entry = entries.get(path.name)
+        if entry is None or not is_fresh(entry, file_record(path)):
+            continue
+        h, w = entry["hw"]
+        dataset.ims[i] = images[entry["slot"], :h, :w]
+        dataset.im_hw0[i] = tuple(entry["hw0"])
+        dataset.im_hw[i] = (h, w)
+        attached += 1
+
+    if attached:
+        # Mosaic выбирает пары из буфера недавно прочитанных изображений,
+        # а изображения из кэша в него не попадают: как при cache="ram",
+        # пары выбираются из всего датасета
+        dataset.cache = "ram"
+        dataset.transforms = dataset.build_transforms(hyp=hyp)
+    return attached
+
+
+class ImageCacheMixin:
+    """Строит датасеты обучения поверх кэша уменьшенных изображений."""
+
+    def __init__(self, *args: Any, image_cache: Path | None = None, **kwargs: Any):
+        self.image_cache = image_cache
+        super().__init__(*args, **kwargs)
+
+    def build_dataset(
+        self, img_path: str, mode: str = "train", batch: int | None = None
+    ):
+        dataset = super().build_dataset(img_path, mode, batch)  # type: ignore
+        if self.image_cache is not None:
+            # Кэш выборки лежит в каталоге с ее именем: .../train/images -> train
+            split = Path(img_path).parent.name
+            attached = attach_image_cache(
+                dataset, self.image_cache / split, self.args  # type: ignore
+            )
+            LOGGER.info(
+                f"{mode}: {attached}/{len(dataset.im_files)} images from cache "
+                f"{self.image_cache / split}"
+            )
+        return dataset
+
+
+class CachedDetectionTrainer(ImageCacheMixin, DetectionTrainer):
+    pass
+
+
+class CachedSegmentationTrainer(ImageCacheMixin, SegmentationTrainer):
+    pass
@@ -1,20 +1,117 @@
+import csv
 import json
+import os
+import re
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-
-import pandas as pd
-
-
-def extract_labels(labels_data_filepath: Path) -> None:
-    """Извлекает координаты полигона панели счетчика."""
-
-    data = pd.read_csv(labels_data_filepath)
-    for _, row in data.iterrows():
-        image_path = labels_data_filepath.parent / "labels" / Path(row["photo_name"])
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+# Размер порции записей, которую обрабатывает один процесс
+BATCH_SIZE = 2000
+
+# Размер блока при потоковом чтении JSON-экспорта
+READ_CHUNK_SIZE = 1 << 20
+
+SEPARATORS = re.compile(r"[\s,]*")
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """Разбивает поток записей на порции."""
+
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def bounded_map(
+    executor: Executor,
+    fn: Callable[..., Any],
+    batches: Iterable[Any],
+    *args: Any,
+    max_pending: int,
+) -> Iterator[Any]:
+    """Как `executor.map`, но читает вход по мере обработки, а не целиком."""
+
+    pending: deque[Future] = deque()
+    for batch in batches:
+        pending.append(executor.submit(fn, batch, *args))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def output_mtime(output: Path) -> float | None:
+    """Возвращает время изменения файла разметки или None, если его нет."""
+
+    try:
+        return os.stat(output).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def write_label(output: Path, content: str, exists: bool) -> bool:
+    """Записывает файл разметки, только если его содержимое изменилось."""
+
+    if exists:
+        with open(output, encoding="utf-8") as f:
+            if f.read() == content:
+                # Обновляем время изменения, чтобы следующий запуск пропустил файл
+                os.utime(output)
+                return False
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(content)
+    return True
+
+
+def extract_labels(labels_data_filepath: Path, workers: int | None = None) -> int:
+    """Извлекает координаты полигона панели счетчика.
+
+    CSV читается потоково, порции строк конвертируются в пуле процессов.
+    Возвращает число записанных файлов разметки.
+    """
+
+    labels_dir = labels_data_filepath.parent / "labels"
+    labels_dir.mkdir(parents=True, exist_ok=True)
+    source_mtime = labels_data_filepath.stat().st_mtime
+    workers = workers or os.cpu_count() or 1
+
+    with labels_data_filepath.open(encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(f)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return sum(
+                bounded_map(
+                    executor,
+                    save_labels_batch,
+                    batched(rows, BATCH_SIZE),
+                    labels_dir,
+                    source_mtime,
+                    max_pending=2 * workers,
+                )
+            )
+
+
+def save_labels_batch(
+    rows: list[Mapping[str, str]], labels_dir: Path, source_mtime: float
+) -> int:
+    """Конвертирует и сохраняет порцию строк CSV."""
+
+    written = 0
+    for row in rows:
+        label_path = (labels_dir / row["photo_name"]).with_suffix(".txt")
+        mtime = output_mtime(label_path)
+        if mtime is not None and mtime >= source_mtime:
+            continue
+        if label_path.parent != labels_dir:
+            label_path.parent.mkdir(parents=True, exist_ok=True)
         label_str = extract_label_from_row(row)
-        save_label(label_str, image_path)
+        written += write_label(label_path, label_str, exists=mtime is not None)
+    return written
 
 
-def extract_label_from_row(row: pd.Series) -> str:
+def extract_label_from_row(row: Mapping[str, str]) -> str:
     """Извлекает метки из строки датасета."""
 
     class_label = ["0"]
@@ -28,31 +125,105 @@ def extract_label_from_row(row: pd.Series) -> str:
     return label_str
 
 
-def save_label(label_str: str, image_path: Path) -> None:
-    """Сохраняет разметку панели счетчика в текстовый файл."""
-
-    image_path.parent.mkdir(parents=True, exist_ok=True)
-    label_path = image_path.with_suffix(".txt")
-    label_path.write_text(label_str, encoding="utf-8")
-
-
-def extract_label_studio_labels(
-    labels_data_path: Path, labels_output_path: Path, class_labels: dict[int, str]
-) -> None:
-    """Создает датасет для обучения YOLO."""
-
-    for labels_path in labels_data_path.glob("*.txt"):
+def iter_json_array(path: Path) -> Iterator[dict]:
+    """Потоково читает элементы JSON-массива верхнего уровня.
+
+    В памяти держится только текущий блок файла, а не весь экспорт.
+    """
+
+    decoder = json.JSONDecoder()
+    with path.open(encoding="utf-8") as f:
+        buffer = f.read(READ_CHUNK_SIZE).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a JSON array")
+        pos, eof = 1, False
+        while True:
+            # Пропускаем пробелы и запятые между элементами без копирования буфера
+            pos = SEPARATORS.match(buffer, pos).end()  # type: ignore
+            if buffer.startswith("]", pos):
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(READ_CHUNK_SIZE)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield item
+
+
+def iter_label_studio_tasks(labels_data_path: Path) -> Iterator[tuple[dict, float]]:
+    """Перебирает задачи Label Studio вместе со временем изменения их источника.
+
+    Поддерживаются экспорт по одной задаче в `.txt`-файле и экспорт
+    одним JSON-файлом со списком задач.
+    """
+
+    for labels_path in sorted(labels_data_path.glob("*.txt")):
         with labels_path.open(encoding="utf-8") as f:
             data = json.load(f)
+        yield {
+            "image": data["task"]["data"]["image"],
+            "result": data["result"],
+        }, labels_path.stat().st_mtime
 
-        labels_str = convert_labels(data, class_labels)
-        file_name = Path(data["task"]["data"]["image"])
+    for export_path in sorted(labels_data_path.glob("*.json")):
+        source_mtime = export_path.stat().st_mtime
+        for task in iter_json_array(export_path):
+            annotations = [a for a in task.get("annotations", []) if a.get("result")]
+            if annotations:
+                result = annotations[-1]["result"]
+                yield {"image": task["data"]["image"], "result": result}, source_mtime
 
-        labels_output_path.mkdir(parents=True, exist_ok=True)
-        output = labels_output_path / file_name.with_suffix(".txt")
-        with output.open(encoding="utf-8") as f:
-            for l_str in labels_str:
-                f.write(f"{l_str}\n")
+
+def extract_label_studio_labels(
+    labels_data_path: Path,
+    labels_output_path: Path,
+    class_labels: dict[int, str],
+    workers: int | None = None,
+) -> int:
+    """Создает датасет для обучения YOLO.
+
+    Задачи читаются потоково и конвертируются порциями в пуле процессов.
+    Возвращает число записанных файлов разметки.
+    """
+
+    labels_output_path.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return sum(
+            bounded_map(
+                executor,
+                save_label_studio_batch,
+                batched(iter_label_studio_tasks(labels_data_path), BATCH_SIZE),
+                labels_output_path,
+                class_labels,
+                max_pending=2 * workers,
+            )
+        )
+
+
+def save_label_studio_batch(
+    tasks: list[tuple[dict, float]],
+    labels_output_path: Path,
+    class_labels: dict[int, str],
+) -> int:
+    """Конвертирует и сохраняет порцию задач Label Studio."""
+
+    written = 0
+    for task, source_mtime in tasks:
+        # В экспорте Label Studio путь абсолютный (/data/upload/...)
+        file_name = Path(task["image"]).name
+        output = labels_output_path / Path(file_name).with_suffix(".txt")
+        mtime = output_mtime(output)
+        if mtime is not None and mtime >= source_mtime:
+            continue
+        labels_str = convert_labels(task, class_labels)
+        content = "".join(f"{l_str}\n" for l_str in labels_str)
+        written += write_label(output, content, exists=mtime is not None)
+    return written
 
 
 def convert_labels(data: dict, class_labels: dict[int, str]) -> list[str]:
@@ -0,0 +1,77 @@
+import time
+from typing import Any
+
+import torch
+from ultralytics.utils import LOGGER
+
+EVENTS = (
+    "on_train_epoch_start",
+    "on_train_batch_start",
+    "on_train_batch_end",
+    "on_train_epoch_end",
+)
+
+
+class TrainProfiler:
+    """Делит время эпохи обучения на ожидание данных и вычисления.
+
+    Время от конца предыдущего батча до начала следующего -- загрузка
+    данных (чтение, декодирование, аугментации), от начала до конца
+    батча -- прямой и обратный проход с шагом оптимизатора.
+    """
+
+    def __init__(self) -> None:
+        self.epochs: list[dict[str, float]] = []
+        self._mark = 0.0
+        self._data_s = 0.0
+        self._compute_s = 0.0
+        self._batches = 0
+
+    def register(self, target: Any) -> None:
+        """Подключает профилировщик к тренеру или модели YOLO."""
+
+        for event in EVENTS:
+            target.add_callback(event, getattr(self, event))
+
+    def on_train_epoch_start(self, trainer: Any) -> None:
+        self._data_s = self._compute_s = 0.0
+        self._batches = 0
+        self._mark = time.perf_counter()
+
+    def on_train_batch_start(self, trainer: Any) -> None:
+        now = time.perf_counter()
+        self._data_s += now - self._mark
+        self._mark = now
+
+    def on_train_batch_end(self, trainer: Any) -> None:
+        # Вычисления на GPU асинхронны: ждем их окончания для честного замера
+        if trainer.device.type == "cuda":
+            torch.cuda.synchronize(trainer.device)
+        now = time.perf_counter()
+        self._compute_s += now - self._mark
+        self._batches += 1
+        self._mark = now
+
+    def on_train_epoch_end(self, trainer: Any) -> None:
+        images = min(
+            self._batches * trainer.batch_size, len(trainer.train_loader.dataset)
+        )
+        total_s = self._data_s + self._compute_s
+        stats = {
+            "epoch": trainer.epoch + 1,
+            "images": images,
+            "data_s": self._data_s,
+            "compute_s": self._compute_s,
+            "images_per_s": images / total_s if total_s else 0.0,
+            "data_images_per_s": images / self._data_s if self._data_s else 0.0,
+            "compute_images_per_s": (
+                images / self._compute_s if self._compute_s else 0.0
+            ),
+        }
+        self.epochs.append(stats)
+        LOGGER.info(
+            f"Profile epoch {stats['epoch']}: {stats['images_per_s']:.1f} img/s, "
+            f"data {stats['data_s']:.1f} s ({stats['data_images_per_s']:.1f} img/s), "
+            f"compute {stats['compute_s']:.1f} s "
+            f"({stats['compute_images_per_s']:.1f} img/s)"
+        )
@@ -15,7 +15,7 @@ def test_model(
     # Получить предсказания
     model(
         config.imgs_path,
-        device=0,
+        device=config.device,
         imgsz=config.img_size,
         conf=config.conf,
         save=True,
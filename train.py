@@ -1,17 +1,26 @@
+from functools import partial
+from pathlib import Path
+
 import torch
 from ultralytics import YOLO
-from ultralytics.models.yolo.segment import SegmentationTrainer
 
 from src.config import (
     Task,
     TrainConfig,
     dataset_config_digits,
     dataset_config_panels,
+    materialize_config,
     train_config_digits,
     train_config_panels,
 )
 from src.datasets import copy_split_data, create_config_file, train_test_split
+from src.image_cache import (
+    CachedDetectionTrainer,
+    CachedSegmentationTrainer,
+    cache_dataset_images,
+)
 from src.labels import extract_label_studio_labels, extract_labels
+from src.profiling import TrainProfiler
 
 
 def train_model(task: Task, config: TrainConfig, epochs: int) -> None:
@@ -29,27 +38,45 @@ def train_model(task: Task, config: TrainConfig, epochs: int) -> None:
             "imgsz": config.img_size,
             "save": True,
             "project": config.project_path,
-            "device": 0,
+            "device": config.device,
             "plots": True,
         }
-        trainer = SegmentationTrainer(overrides=args)
+        trainer = CachedSegmentationTrainer(
+            overrides=args, image_cache=config.cache_path
+        )
+        if config.profile:
+            TrainProfiler().register(trainer)
         trainer.train()
 
     # Задача определения объектов
     elif task == Task.DETECT:
         model = YOLO(config.model_path)
+        if config.profile:
+            TrainProfiler().register(model)
         model.train(
+            trainer=partial(CachedDetectionTrainer, image_cache=config.cache_path),
             data=config.yaml_path,
             epochs=epochs,
             imgsz=config.img_size,
             batch=config.batch_size,
             save=True,
             project=config.project_path,
-            device=0,
+            device=config.device,
             plots=True,
         )
 
 
+def cache_images(dataset_path: Path, config: TrainConfig) -> None:
+    """Уменьшает изображения train и val до размера обучения один раз."""
+
+    if config.cache_path is None:
+        return
+    written = cache_dataset_images(
+        dataset_path, config.cache_path, config.img_size, config.cache_workers
+    )
+    print(f"Image cache {config.cache_path}: {written} images resized")
+
+
 def train_panels(epochs: int = 1):
     """Обучает модель определения панели показаний."""
 
@@ -68,6 +95,8 @@ def train_panels(epochs: int = 1):
             dir_name,
             path_list,
             dataset_config_panels.dataset_path,
+            mode=materialize_config.mode,
+            workers=materialize_config.workers,
         )
 
     # Создание конфига для обучения модели
@@ -77,6 +106,9 @@ def train_panels(epochs: int = 1):
         yaml_path=train_config_panels.yaml_path,
     )
 
+    # Уменьшение изображений для обучения
+    cache_images(dataset_config_panels.dataset_path, train_config_panels)
+
     # Обучение модели
     train_model(Task.SEGMENT, train_config_panels, epochs)
 
@@ -103,6 +135,8 @@ def train_digits(epochs: int = 1):
             dir_name,
             path_list,
             dataset_config_digits.dataset_path,
+            mode=materialize_config.mode,
+            workers=materialize_config.workers,
         )
 
     # Создание конфига для обучения модели
@@ -112,6 +146,9 @@ def train_digits(epochs: int = 1):
         yaml_path=train_config_digits.yaml_path,
     )
 
+    # Уменьшение изображений для обучения
+    cache_images(dataset_config_digits.dataset_path, train_config_digits)
+
     # Обучение модели
     train_model(Task.DETECT, train_config_digits, epochs)
 